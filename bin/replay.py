@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+"""
+Replays recorded pipeline failure events through enrich_sqs_event against the local stand-ins
+and reports throughput, latency percentiles, outbound calls per event and peak RSS.
+
+The input file holds EventBridge events or SQS records, one JSON document per line or a JSON
+array. Run it from the repository root with src and the root on PYTHONPATH, e.g.
+
+    PYTHONPATH=src:. python bin/replay.py events.jsonl --concurrency 20 --batch-size 10
+
+Concurrent invocations share the process, and with it the in-process caches, like a single
+warm container would. --cold resets the handler to a fresh container before every batch, its
+caches, idempotency records, breaker, rate limiter and clients, to model a burst spread over
+fresh instances instead. An invocation that raises anything but a batch failure is counted
+as an error with its traceback on stderr. The handler's own settings, e.g. GITHUB_REQUESTS_PER_SECOND,
+are read from the environment as in Lambda. Its logs and metrics go to stderr, leaving the
+report alone on stdout.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from aws_lambda_context import LambdaContext
+from tests.stand_ins import CodePipelineFake
+from tests.stand_ins import FaultInjector
+from tests.stand_ins import GitHubStandIn
+from tests.stand_ins import lognormal
+from tests.stand_ins import reset_container_state
+
+
+class ParameterStoreFake:
+    """Stands in for the SSM client, answering get_parameter with a fixed token."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_parameter(self, Name: str, WithDecryption: bool = False):
+        with self._lock:
+            self.calls += 1
+        return {"Parameter": {"Name": Name, "Value": "replay-token"}}
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Replay recorded pipeline failure events through enrich_sqs_event"
+    )
+    parser.add_argument(
+        "events",
+        nargs="?",
+        type=Path,
+        help="file of EventBridge events or SQS records, JSON lines or a JSON array",
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="generate this many distinct pipeline failures instead of reading a file",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="replay the events this many times"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=10, help="SQS records per invocation"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=1, help="invocations running at once"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0,
+        help="target events per second, 0 for as fast as possible",
+    )
+    parser.add_argument(
+        "--cold",
+        action="store_true",
+        help="reset the handler to a fresh container before every batch",
+    )
+    parser.add_argument(
+        "--github-latency-ms", type=float, default=80, help="median GitHub latency"
+    )
+    parser.add_argument(
+        "--github-error-rate",
+        type=float,
+        default=0,
+        help="fraction of GitHub requests that 5xx",
+    )
+    parser.add_argument(
+        "--github-rate-limit",
+        type=int,
+        default=5000,
+        help="GitHub quota left at the start",
+    )
+    parser.add_argument(
+        "--pipeline-latency-ms",
+        type=float,
+        default=40,
+        help="median CodePipeline latency",
+    )
+    parser.add_argument(
+        "--pipeline-throttle-rate",
+        type=float,
+        default=0,
+        help="fraction of CodePipeline calls throttled",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed for the injected latency and faults"
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def to_sqs_record(document: dict) -> dict:
+    if "body" in document:
+        return document
+    return {"messageId": str(uuid.uuid4()), "body": json.dumps(document)}
+
+
+def read_records(path: Path) -> list:
+    text = path.read_text()
+    if text.lstrip().startswith("["):
+        documents = json.loads(text)
+    else:
+        documents = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [to_sqs_record(document) for document in documents]
+
+
+def synthetic_records(count: int) -> list:
+    return [
+        to_sqs_record(
+            {
+                "source": "aws.codepipeline",
+                "detail-type": "CodePipeline Pipeline Execution State Change",
+                "detail": {
+                    "pipeline": f"pipeline-{index % 200}",
+                    "execution-id": f"execution-{index}",
+                    "state": "FAILED",
+                },
+            }
+        )
+        for index in range(count)
+    ]
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return (
+        ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+    )
+
+
+def replay(args: argparse.Namespace) -> dict:
+    # configure the handler before importing it, it reads its settings at import
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+    import handler
+    from exceptions import BatchEnrichmentException
+
+    records = (
+        synthetic_records(args.synthetic)
+        if args.synthetic
+        else read_records(args.events)
+    )
+    records = [
+        dict(record, messageId=f"{record['messageId']}-{run}")
+        for run in range(args.repeat)
+        for record in records
+    ]
+    batches = [
+        records[start : start + args.batch_size]
+        for start in range(0, len(records), args.batch_size)
+    ]
+
+    github = GitHubStandIn(
+        faults=FaultInjector(
+            latency=lognormal(args.github_latency_ms),
+            error_rate=args.github_error_rate,
+            error_statuses=(500, 502, 503, 429),
+            seed=args.seed,
+        ),
+        rate_limit=args.github_rate_limit,
+    ).start()
+    pipeline = CodePipelineFake(
+        faults=FaultInjector(
+            latency=lognormal(args.pipeline_latency_ms),
+            error_rate=args.pipeline_throttle_rate,
+            error_statuses=(400,),
+            seed=args.seed,
+        )
+    )
+    parameters = ParameterStoreFake()
+    handler.github_api_url = github.url
+    handler.github_client_backend = "urllib3"
+    handler.pipeline_client = pipeline
+    handler.ssm_client = parameters
+
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def invoke(batch: list) -> None:
+        nonlocal failures
+        if args.cold:
+            reset_container_state(handler)
+        context = LambdaContext()
+        context.aws_request_id = str(uuid.uuid4())
+        start = time.perf_counter()
+        failed = 0
+        try:
+            handler.enrich_sqs_event(batch, context)
+        except BatchEnrichmentException as e:
+            failed = len(e.message_ids)
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            failures += failed
+
+    started = time.perf_counter()
+    futures = []
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for index, batch in enumerate(batches):
+                if args.rate > 0:
+                    # dispatch each batch when the target rate says its first event is due
+                    due = started + index * args.batch_size / args.rate
+                    time.sleep(max(due - time.perf_counter(), 0))
+                futures.append(executor.submit(invoke, batch))
+        elapsed = time.perf_counter() - started
+    finally:
+        github.close()
+
+    errors = 0
+    for future in futures:
+        error = future.exception()
+        if error is not None:
+            errors += 1
+            traceback.print_exception(error, file=sys.stderr)
+
+    events = len(records)
+    return {
+        "events": events,
+        "batches": len(batches),
+        "failed_events": failures,
+        "errored_batches": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "events_per_second": round(events / elapsed, 1),
+        "batch_latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 1),
+            "p90": round(percentile(latencies, 0.90), 1),
+            "p99": round(percentile(latencies, 0.99), 1),
+            "max": round(max(latencies, default=0), 1),
+        },
+        "calls_per_event": {
+            "github": round(len(github.requests) / events, 3),
+            "codepipeline": round(
+                (len(pipeline.calls) + len(pipeline.list_calls)) / events, 3
+            ),
+            "ssm": round(parameters.calls / events, 3),
+        },
+        "github_quota_remaining": github.remaining,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mib": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def print_report(report: dict) -> None:
+    latency = report["batch_latency_ms"]
+    calls = report["calls_per_event"]
+    print(
+        f"events            {report['events']} in {report['batches']} batches, {report['failed_events']} failed"
+        f", {report['errored_batches']} batches errored"
+    )
+    print(
+        f"throughput        {report['events_per_second']} events/s over {report['elapsed_seconds']}s"
+    )
+    print(
+        f"batch latency ms  p50 {latency['p50']}  p90 {latency['p90']}  p99 {latency['p99']}  max {latency['max']}"
+    )
+    print(
+        f"calls per event   github {calls['github']}  codepipeline {calls['codepipeline']}  ssm {calls['ssm']}"
+    )
+    print(f"github quota left {report['github_quota_remaining']}")
+    print(f"peak RSS          {report['peak_rss_mib']} MiB")
+
+
+def main(argv: list | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.events is None and not args.synthetic:
+        print("replay: give an events file or --synthetic N", file=sys.stderr)
+        return 2
+
+    # the handler logs and prints its metrics to stdout, which is kept for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = replay(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 1 if report["errored_batches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import threading
+import time
+
+from exceptions import CircuitOpenException
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around calls to a dependency that can be slow or down.
+
+    After failure_threshold consecutive failures the breaker opens and rejects calls straight
+    away with CircuitOpenException. Once reset_timeout seconds have passed a single probe call
+    is let through (half-open): if it succeeds the breaker closes again, otherwise it re-opens.
+    is_failure decides which errors count against the dependency, any other error means the
+    dependency answered and counts as a success. is_unsent picks out errors raised before the
+    call reached the dependency, e.g. by a client-side rate limiter, which say nothing about it
+    and are raised without affecting the breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        is_failure=lambda error: True,
+        is_unsent=lambda error: False,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.is_unsent = is_unsent
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+
+    def call(self, operation, *args, **kwargs):
+        """Calls operation(*args, **kwargs) unless the breaker is open."""
+        if not self.allow_request():
+            raise CircuitOpenException(f"Circuit breaker for {self.name} is open")
+
+        try:
+            result = operation(*args, **kwargs)
+        except Exception as e:
+            if self.is_unsent(e):
+                # a half-open breaker lets the next call probe instead
+                self.release_probe()
+            elif self.is_failure(e):
+                self.record_failure()
+            else:
+                # the dependency answered, so the call still proves it is up
+                self.record_success()
+            raise
+
+        self.record_success()
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
@@ -0,0 +1,34 @@
+async def run_all(operation, items: list, executor) -> list:
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    # gather keeps the results in the order of items whichever call finishes first
+    return await asyncio.gather(
+        *(loop.run_in_executor(executor, operation, item) for item in items),
+        return_exceptions=True,
+    )
+
+
+def run_concurrently(operation, items: list, concurrency: int, executor) -> list:
+    """
+    Calls operation(item) for every item, at most concurrency at a time, and returns what each
+    call returned, or the exception it raised, in the order of items.
+
+    The lookups the enrichment makes are blocking, so every call runs on a thread of executor,
+    which is sized to concurrency and so bounds how many are in flight, while an asyncio event
+    loop run inside the synchronous caller, such as a Lambda entry point, gathers the results.
+    A single item, or a concurrency of one, is run inline without importing asyncio or
+    starting an event loop, which keeps it off the cold start.
+    """
+    if len(items) <= 1 or concurrency <= 1:
+        results = []
+        for item in items:
+            try:
+                results.append(operation(item))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    import asyncio
+
+    return asyncio.run(run_all(operation, items, executor))
@@ -8,3 +8,47 @@ class NoExecutionIdFoundException(Exception):
     """Is raised when no execution id is found in the event."""
 
     pass
+
+
+class RetryBudgetExhaustedException(Exception):
+    """Is raised when a call cannot be retried without overrunning the Lambda invocation deadline."""
+
+    pass
+
+
+class CircuitOpenException(Exception):
+    """Is raised when a call is rejected because its circuit breaker is open."""
+
+    pass
+
+
+class GitHubApiException(Exception):
+    """Is raised when the GitHub API answers a request with an error status."""
+
+    def __init__(self, status: int, message: str, headers: dict | None = None):
+        super().__init__(f"{status} {message}")
+        self.status = status
+        self.headers = headers or {}
+
+
+class RateLimitedException(Exception):
+    """Is raised when a request is held back to stay inside an API rate limit."""
+
+    pass
+
+
+class UnsupportedEventException(Exception):
+    """Is raised when no enricher is registered for the source and detail-type of an event."""
+
+    pass
+
+
+class BatchEnrichmentException(Exception):
+    """Is raised when records of an SQS batch could not be enriched, so the whole batch is retried."""
+
+    def __init__(self, message_ids: list):
+        super().__init__(
+            f"Could not enrich {len(message_ids)} record(s) of the SQS batch: "
+            + ", ".join(str(message_id) for message_id in message_ids)
+        )
+        self.message_ids = message_ids
@@ -0,0 +1,242 @@
+import json
+import math
+import time
+from urllib.parse import quote
+
+import urllib3
+from cache import LRUCache
+from exceptions import GitHubApiException
+from exceptions import RateLimitedException
+from rate_limiter import RateLimiter
+
+user_agent = "aws-lambda-telemetry-eventbridge-enrichment"
+
+
+def compare_commit_authors(comparison: dict) -> list:
+    """
+    Returns (sha, author email) for every commit of a compare response, oldest first, leaving
+    out commits without an author email.
+    """
+    return [
+        (commit["sha"], commit["commit"]["author"]["email"])
+        for commit in comparison.get("commits", [])
+        if (commit.get("commit", {}).get("author") or {}).get("email")
+    ]
+
+
+class GitHubCommitClient:
+    """
+    Minimal GitHub client built directly on urllib3 for the lookups the enrichment makes.
+
+    A commit author costs a single GET /repos/{repo}/commits/{sha} rather than the get_repo
+    and get_commit pair PyGithub needs, and only the fields used are read from the response.
+    The authors of a range of commits cost a single GET /repos/{repo}/compare/{base}...{head}.
+    Connections are pooled and kept alive until close() is called. Error statuses raise
+    GitHubApiException and transport failures raise ConnectionError, so both can be told
+    apart and retried the same way as errors from PyGithub.
+
+    Every request first takes a token from the rate_limiter, which is kept up to date with
+    the quota GitHub reports. GET responses are kept with their ETag and asked for again with
+    If-None-Match, GitHub answers 304 Not Modified without counting it against the quota.
+    time_left returns the milliseconds left to the caller's deadline, or None without one, and
+    cuts the timeout of every request short so it cannot run past it.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = "https://api.github.com",
+        timeout: float = 5,
+        pool_size: int = 10,
+        rate_limiter: RateLimiter | None = None,
+        etag_cache_size: int = 256,
+        time_left=lambda: None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.time_left = time_left
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # (remaining, limit) from the last response, -1 until GitHub has answered
+        self.rate_limiting = (-1, -1)
+        self.not_modified = 0
+        # ETags can differ per token, so they are dropped with the client when the token changes
+        self._etags = LRUCache(maxsize=etag_cache_size)
+        self._pool = urllib3.PoolManager(
+            maxsize=pool_size,
+            timeout=urllib3.Timeout(total=timeout),
+            retries=False,
+            headers={
+                "Accept": "application/vnd.github+json",
+                "Authorization": f"Bearer {token}",
+                "User-Agent": user_agent,
+                "X-GitHub-Api-Version": "2022-11-28",
+            },
+        )
+
+    def request(self, method: str, path: str, body: dict | None = None) -> dict:
+        headers = None
+        encoded_body = None
+        if body is not None:
+            headers = {**self._pool.headers, "Content-Type": "application/json"}
+            encoded_body = json.dumps(body)
+
+        cached = self._etags.get(path) if method == "GET" else None
+        if cached is not None:
+            headers = {**self._pool.headers, "If-None-Match": cached[0]}
+        self.rate_limiter.acquire(conditional=cached is not None)
+
+        # the pool's own timeout applies unless the deadline is closer
+        options = {}
+        time_left_ms = self.time_left()
+        if time_left_ms is not None and time_left_ms < self.timeout * 1000:
+            options["timeout"] = urllib3.Timeout(total=max(time_left_ms, 1) / 1000)
+        try:
+            response = self._pool.request(
+                method,
+                f"{self.base_url}{path}",
+                body=encoded_body,
+                headers=headers,
+                **options,
+            )
+        except urllib3.exceptions.HTTPError as e:
+            raise ConnectionError(f"GitHub request {method} {path} failed: {e}") from e
+
+        self.record_rate_limit(response.headers)
+        if response.status == 304 and cached is not None:
+            self.not_modified += 1
+            return cached[1]
+        if response.status in (403, 429) and (
+            response.headers.get("X-RateLimit-Remaining") == "0"
+        ):
+            raise RateLimitedException(
+                f"GitHub rate limit exhausted by {method} {path}"
+            )
+        if response.status >= 400:
+            try:
+                message = response.json().get("message", response.reason)
+            except ValueError:
+                message = response.reason
+            raise GitHubApiException(response.status, message, dict(response.headers))
+
+        payload = response.json()
+        etag = response.headers.get("ETag")
+        if method == "GET" and etag:
+            self._etags.set(path, (etag, payload))
+        return payload
+
+    def record_rate_limit(self, headers) -> None:
+        remaining = headers.get("X-RateLimit-Remaining")
+        limit = headers.get("X-RateLimit-Limit")
+        if remaining is None or limit is None:
+            return
+        # GraphQL has a separate points based quota, the limiter paces the REST (core) quota
+        if headers.get("X-RateLimit-Resource", "core") == "core":
+            self.rate_limiting = (int(remaining), int(limit))
+            reset_at = float(headers.get("X-RateLimit-Reset", time.time() + 3600))
+            self.rate_limiter.update(int(remaining), reset_at)
+
+    def get_commit_author_email(self, github_repo: str, commit_sha: str) -> str:
+        # per_page limits the list of changed files returned with the commit, which is not used
+        commit = self.request(
+            "GET",
+            f"/repos/{github_repo}/commits/{quote(commit_sha, safe='')}?per_page=1",
+        )
+        return commit["commit"]["author"]["email"]
+
+    def get_compare_commit_authors(
+        self, github_repo: str, base_sha: str, head_sha: str
+    ) -> list:
+        # GitHub lists up to 250 commits of a comparison in the one response
+        comparison = self.request(
+            "GET",
+            f"/repos/{github_repo}/compare/"
+            f"{quote(base_sha, safe='')}...{quote(head_sha, safe='')}",
+        )
+        return compare_commit_authors(comparison)
+
+    def graphql(self, query: str, variables: dict) -> dict:
+        return self.request(
+            "POST", "/graphql", {"query": query, "variables": variables}
+        )
+
+    def close(self) -> None:
+        self._pool.clear()
+
+
+class PyGithubCommitClient:
+    """
+    The same lookups as GitHubCommitClient made through PyGithub, kept as an alternative
+    backend. PyGithub is only imported when this backend is used. Requests are paced by the
+    same rate_limiter, but PyGithub does not send conditional requests, and it has no per
+    request timeout, so time_left is not used.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = "https://api.github.com",
+        timeout: float = 5,
+        pool_size: int = 10,
+        rate_limiter: RateLimiter | None = None,
+        etag_cache_size: int = 256,
+        time_left=lambda: None,
+    ):
+        from github import Auth
+        from github import Github
+
+        # PyGithub's own retries would sleep past the invocation deadline, the caller retries
+        self.github = Github(
+            auth=Auth.Token(token),
+            base_url=base_url,
+            pool_size=pool_size,
+            # PyGithub only accepts whole seconds
+            timeout=max(math.ceil(timeout), 1),
+            retry=None,
+        )
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+    @property
+    def rate_limiting(self) -> tuple:
+        return self.github.requester.rate_limiting
+
+    def record_rate_limit(self) -> None:
+        remaining, _ = self.rate_limiting
+        if remaining >= 0:
+            reset_at = self.github.requester.rate_limiting_resettime
+            self.rate_limiter.update(remaining, reset_at)
+
+    def get_commit_author_email(self, github_repo: str, commit_sha: str) -> str:
+        self.rate_limiter.acquire()
+        try:
+            repo = self.github.get_repo(github_repo)
+            self.rate_limiter.acquire()
+            commit = repo.get_commit(sha=commit_sha)
+        finally:
+            self.record_rate_limit()
+        return commit.commit.author.email
+
+    def get_compare_commit_authors(
+        self, github_repo: str, base_sha: str, head_sha: str
+    ) -> list:
+        # a lazy repository is not fetched, so the comparison is the only request
+        repo = self.github.get_repo(github_repo, lazy=True)
+        self.rate_limiter.acquire()
+        try:
+            comparison = repo.compare(base_sha, head_sha)
+        finally:
+            self.record_rate_limit()
+        # Comparison.commits pages through the commits again, the first page is already here
+        return compare_commit_authors(comparison.raw_data)
+
+    def graphql(self, query: str, variables: dict) -> dict:
+        requester = self.github.requester
+        self.rate_limiter.acquire()
+        _, response = requester.requestJsonAndCheck(
+            "POST",
+            requester.graphql_url,
+            input={"query": query, "variables": variables},
+        )
+        return response
+
+    def close(self) -> None:
+        self.github.close()
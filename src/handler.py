@@ -1,123 +1,1235 @@
 import json
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import parse_qs
 from urllib.parse import urlparse
 
-import boto3
 from aws_lambda_context import LambdaContext
 from aws_lambda_powertools import Logger
-from botocore.config import Config
-from botocore.exceptions import ClientError
+from aws_lambda_powertools.metrics import MetricUnit
+from cache import LRUCache
+from circuit_breaker import CircuitBreaker
+from engine import run_concurrently
+from exceptions import BatchEnrichmentException
+from exceptions import CircuitOpenException
 from exceptions import EmptyEventDetailException
 from exceptions import NoExecutionIdFoundException
-from github import Auth
-from github import Github
+from exceptions import RateLimitedException
+from exceptions import RetryBudgetExhaustedException
+from exceptions import UnsupportedEventException
+from github_client import GitHubCommitClient
+from github_client import PyGithubCommitClient
 from helper import Helper
+from identity_directory import IdentityDirectory
+from instrumentation import add_metric
+from instrumentation import log_metrics
+from instrumentation import timed
+from instrumentation import track_cache
+from instrumentation import track_counter
+from profiling import Profiler
+from rate_limiter import RateLimiter
+from registry import EnricherRegistry
+from retry import is_client_error
+from retry import is_retryable
+from retry import RetryBudget
+from shared_cache import SharedCache
 
-config = Config(retries={"max_attempts": 60, "mode": "standard"})
-ssm_client = boto3.client("ssm", config=config, region_name="eu-west-2")
-pipeline_client = boto3.client("codepipeline", config=config, region_name="eu-west-2")
+aws_connect_timeout = float(os.environ.get("AWS_CONNECT_TIMEOUT_SECONDS", "2"))
+aws_read_timeout = float(os.environ.get("AWS_READ_TIMEOUT_SECONDS", "5"))
+
+# boto3 and the clients are only built on first use (see aws_client), so cold starts that
+# return early never pay for them. They are still exposed as ssm_client and pipeline_client
+client_services = {
+    "ssm_client": "ssm",
+    "pipeline_client": "codepipeline",
+    "dynamodb_client": "dynamodb",
+    "s3_client": "s3",
+}
+client_lock = threading.Lock()
+# clients with timeouts cut down to fit the time left in an invocation, see deadline_client
+deadline_clients = {}
 
 github_token_param = "/secrets/github/telemetry_github_token"  # nosec B105
 
+# The retry budget, caches, rate limiter, circuit breaker and profiler below are created once
+# per container at import, so their state carries across warm invocations
+retry_budget = RetryBudget(
+    max_attempts=int(os.environ.get("RETRY_MAX_ATTEMPTS", "5")),
+    base_delay_ms=int(os.environ.get("RETRY_BASE_DELAY_MS", "100")),
+    max_delay_ms=int(os.environ.get("RETRY_MAX_DELAY_MS", "2000")),
+    reserve_ms=int(os.environ.get("RETRY_DEADLINE_RESERVE_MS", "1000")),
+)
+
+# Decrypted SSM parameters are kept for the lifetime of the container so warm invocations
+# do not pay for a KMS-decrypting SSM round trip on every event
+secret_cache = LRUCache(
+    maxsize=16, ttl=float(os.environ.get("SSM_CACHE_TTL_SECONDS", "300"))
+)
+
+# A commit's author never changes, so found authors are kept until evicted. Lookups that find
+# nothing are only kept briefly in case the commit becomes visible to the token later
+author_cache = LRUCache(maxsize=int(os.environ.get("AUTHOR_CACHE_SIZE", "1024")))
+author_not_found_cache_ttl = float(
+    os.environ.get("AUTHOR_NOT_FOUND_CACHE_TTL_SECONDS", "60")
+)
+
+# The source revision of a pipeline execution never changes once it has started
+execution_cache = LRUCache(maxsize=int(os.environ.get("EXECUTION_CACHE_SIZE", "256")))
+
+# When enabled a failure is attributed to every commit since the pipeline last succeeded, not
+# only to the commit it ran. The revisions of the last success before a failing execution are
+# kept briefly, in case an execution that had not finished when it was looked up succeeds
+commit_range_attribution = (
+    os.environ.get("COMMIT_RANGE_ATTRIBUTION", "false").lower() == "true"
+)
+last_success_cache = LRUCache(
+    maxsize=int(os.environ.get("LAST_SUCCESS_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("LAST_SUCCESS_CACHE_TTL_SECONDS", "300")),
+)
+last_success_max_pages = int(os.environ.get("LAST_SUCCESS_MAX_PAGES", "5"))
+# The commits between two shas never change, so compared ranges are kept until evicted, apart
+# from the author cache so a range does not count as an author lookup
+range_cache = LRUCache(maxsize=int(os.environ.get("RANGE_CACHE_SIZE", "256")))
+
+# The GitHub client, and with it the HTTP connection pool to api.github.com, is kept across
+# warm invocations and only rebuilt when the token changes
+github_pool_size = int(os.environ.get("GITHUB_POOL_SIZE", "10"))
+github_keep_alive = os.environ.get("GITHUB_KEEP_ALIVE", "true").lower() == "true"
+github_timeout = float(os.environ.get("GITHUB_TIMEOUT_SECONDS", "5"))
+github_api_url = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+# "urllib3" uses the lightweight GitHubCommitClient, "pygithub" the PyGithub based client
+github_client_backend = os.environ.get("GITHUB_CLIENT_BACKEND", "urllib3")
+github_client = None
+github_client_token = None
+github_client_lock = threading.Lock()
+
+# Every container shares the telemetry token's hourly quota, so requests are paced to make the
+# remaining quota last until it resets. Once it is down to the reserve, events are enriched
+# without the commit author instead of spending what is left
+github_rate_limiter = RateLimiter(
+    rate=float(os.environ.get("GITHUB_REQUESTS_PER_SECOND", "10")),
+    burst=int(os.environ.get("GITHUB_REQUEST_BURST", "20")),
+    reserve=int(os.environ.get("GITHUB_RATE_LIMIT_RESERVE", "500")),
+    max_wait=float(os.environ.get("GITHUB_THROTTLE_MAX_WAIT_SECONDS", "1")),
+)
+# Responses kept per client for conditional requests, a 304 does not count against the quota
+github_etag_cache_size = int(os.environ.get("GITHUB_ETAG_CACHE_SIZE", "256"))
+
+
+def is_github_outage(error: Exception) -> bool:
+    """Returns True for errors that mean GitHub is slow or down rather than the request being wrong."""
+    return isinstance(error, RetryBudgetExhaustedException) or is_retryable(error)
+
+
+# Stops calling GitHub while it is having an incident so events are enriched without the
+# commit author instead of every invocation waiting out timeouts
+github_circuit_breaker = CircuitBreaker(
+    "GitHub",
+    failure_threshold=int(os.environ.get("GITHUB_BREAKER_FAILURE_THRESHOLD", "5")),
+    reset_timeout=float(os.environ.get("GITHUB_BREAKER_RESET_SECONDS", "30")),
+    is_failure=is_github_outage,
+    # held back by the rate limiter, the request never reached GitHub
+    is_unsent=lambda error: isinstance(error, RateLimitedException),
+)
+
+# When enabled the SSM and CodePipeline lookups for an event run in parallel on a small thread
+# pool that, like the caches, lives across warm invocations
+concurrent_lookups = os.environ.get("CONCURRENT_LOOKUPS", "false").lower() == "true"
+lookup_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("LOOKUP_THREADS", "4")),
+    thread_name_prefix="lookup",
+)
+
+# The records of an SQS batch are enriched concurrently, at most enrichment_concurrency at a
+# time, each on a thread of its own pool so they never wait behind the lookups they start
+enrichment_concurrency = int(os.environ.get("ENRICHMENT_CONCURRENCY", "10"))
+record_executor = ThreadPoolExecutor(
+    max_workers=max(enrichment_concurrency, 1), thread_name_prefix="record"
+)
+
+# Number of commits resolved per aliased GraphQL query, kept well inside GitHub's node limits
+github_graphql_batch_size = int(os.environ.get("GITHUB_GRAPHQL_BATCH_SIZE", "50"))
+
 logger = Logger(
     service="aws-lambda-telemetry-eventbridge-enrichment",
-    level=os.environ.get("LOG_LEVEL", "DEBUG"),
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+)
+identity_directory = IdentityDirectory(
+    source=os.environ.get("IDENTITY_DIRECTORY_SOURCE"),
+    ttl=float(os.environ.get("IDENTITY_DIRECTORY_TTL_SECONDS", "900")),
+    defaults=Helper.github_to_slack,
+    logger=logger,
+    # reloads run inside an invocation, so they get its clients cut down to the time left
+    get_client=lambda service: deadline_client(f"{service}_client"),
+)
+helper = Helper(logger, identity_directory)
+
+# Profiles PROFILING_SAMPLE_RATE of the invocations, sampling where every thread spends its time
+# and tracing allocations, and logs a top-N summary or writes it to PROFILING_OUTPUT_DIR. Left at
+# 0 the entry points are called straight through
+profiler = Profiler(
+    sample_rate=float(os.environ.get("PROFILING_SAMPLE_RATE", "0")),
+    interval=float(os.environ.get("PROFILING_INTERVAL_MS", "5")) / 1000,
+    top_n=int(os.environ.get("PROFILING_TOP_N", "15")),
+    trace_memory=os.environ.get("PROFILING_TRACE_MEMORY", "true").lower() == "true",
+    output_dir=os.environ.get("PROFILING_OUTPUT_DIR"),
+    logger=logger,
+)
+
+# Optional second cache tier in DynamoDB shared by every instance, so a burst spread over many
+# cold instances resolves each commit once. The table needs a cache_key (S) partition key and
+# TTL enabled on expires_at. Writes go out on threads of their own, so the lookups on
+# lookup_executor never queue behind them
+enrichment_cache_table = os.environ.get("ENRICHMENT_CACHE_TABLE")
+shared_cache = None
+if enrichment_cache_table:
+    shared_cache = SharedCache(
+        enrichment_cache_table,
+        get_client=lambda: aws_client("dynamodb_client"),
+        ttl=float(os.environ.get("ENRICHMENT_CACHE_TTL_SECONDS", "604800")),
+        executor=ThreadPoolExecutor(
+            max_workers=int(os.environ.get("ENRICHMENT_CACHE_WRITE_THREADS", "2")),
+            thread_name_prefix="shared-cache",
+        ),
+        logger=logger,
+    )
+# Lambda freezes the container once the entry point returns, so its pending writes are waited
+# for before returning. That wait is added to every invocation that wrote to the cache, so it
+# is kept short: a write still pending after it is finished when the container next thaws,
+# or lost if it never does, which only costs a later lookup
+shared_cache_flush_timeout = float(
+    os.environ.get("ENRICHMENT_CACHE_FLUSH_TIMEOUT_SECONDS", "0.2")
+)
+
+track_cache("Secret", secret_cache)
+# Repeated deliveries of a pipeline execution (SQS redelivery, EventBridge at-least-once) get
+# the event enriched the first time back instead of repeating every lookup. Records are kept
+# in the container by default, or in the DynamoDB table named by IDEMPOTENCY_TABLE so every
+# instance shares them. Powertools idempotency imports boto3, so it is set up on first use
+idempotency_enabled = os.environ.get("IDEMPOTENCY_ENABLED", "true").lower() == "true"
+idempotency_table = os.environ.get("IDEMPOTENCY_TABLE")
+idempotency_ttl = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "3600"))
+idempotency_key_jmespath = (
+    '["detail-type", detail.pipeline, detail."execution-id", detail.state, detail.stage, '
+    "detail.action]"
 )
-helper = Helper(logger)
+idempotency_store = None
+idempotency_config = None
+idempotent_enrichment = None
+idempotency_lock = threading.Lock()
 
+track_cache("Author", author_cache)
+track_cache("Execution", execution_cache)
+track_cache("LastSuccess", last_success_cache)
+track_cache("Range", range_cache)
+if shared_cache is not None:
+    track_cache("Shared", shared_cache)
+track_counter("Retries", lambda: retry_budget.retries)
+
+
+def __getattr__(name: str):
+    if name in client_services:
+        return aws_client(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def botocore_config(connect_timeout: float, read_timeout: float):
+    """Returns the client config, importing botocore only once a client is built."""
+    from botocore.config import Config
+
+    # Retries are driven by the deadline-aware retry_budget rather than by botocore, adaptive
+    # mode keeps botocore's client-side rate limiting so throttled calls slow the client down
+    return Config(
+        retries={"total_max_attempts": 1, "mode": "adaptive"},
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+    )
+
+
+def aws_client(name: str):
+    """Returns the named boto3 client, building it the first time it is needed."""
+    client = globals().get(name)
+    if client is None:
+        with client_lock:
+            client = globals().get(name)
+            if client is None:
+                import boto3
+
+                client = boto3.client(
+                    client_services[name],
+                    config=botocore_config(aws_connect_timeout, aws_read_timeout),
+                    region_name="eu-west-2",
+                )
+                globals()[name] = client
+    return client
+
+
+def deadline_client(name: str):
+    """
+    Returns the named client when its connect and read timeouts fit in the time the retry
+    budget has left, otherwise a client whose timeouts are scaled down to fit. The scaled
+    timeouts are rounded down to whole seconds, at least one that the reserve makes room for,
+    so there are only a few such clients per service.
+    """
+    client = aws_client(name)
+    remaining_ms = retry_budget.remaining_ms()
+    full_timeout = aws_connect_timeout + aws_read_timeout
+    # stand-ins used in place of a boto3 client have no timeouts to cut down
+    if (
+        remaining_ms is None
+        or remaining_ms >= full_timeout * 1000
+        or getattr(client, "meta", None) is None
+    ):
+        return client
+
+    seconds = max(int(remaining_ms // 1000), 1)
+    key = (name, seconds)
+    capped = deadline_clients.get(key)
+    if capped is None:
+        with client_lock:
+            capped = deadline_clients.get(key)
+            if capped is None:
+                import boto3
+
+                scale = seconds / full_timeout
+                capped = boto3.client(
+                    client_services[name],
+                    config=botocore_config(
+                        aws_connect_timeout * scale, aws_read_timeout * scale
+                    ),
+                    region_name=client.meta.region_name,
+                )
+                deadline_clients[key] = capped
+    return capped
+
+
+def call_aws(name: str, operation: str, **kwargs):
+    """
+    Calls operation on the named client within the retry budget, every attempt on
+    deadline_client(name) so a single attempt cannot run past the deadline either.
+    """
+
+    def attempt(**kwargs):
+        return getattr(deadline_client(name), operation)(**kwargs)
+
+    attempt.__name__ = operation
+    return retry_budget.call(attempt, **kwargs)
+
+
+def github_status(error: Exception) -> int | None:
+    """Returns the HTTP status of a GitHub API error without importing the GitHub library."""
+    status = getattr(error, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def get_ssm_parameter(ssm_parameter: str, force_fetch: bool = False) -> str:
+    """
+    Returns the decrypted value of an SSM parameter, served from the container-wide secret
+    cache until its TTL expires. The first use after expiry fetches it from SSM again.
+    force_fetch bypasses the cache, e.g. when the cached value has been rotated.
+    """
+    if not force_fetch:
+        value = secret_cache.get(ssm_parameter)
+        if value is not None:
+            return value
 
-def get_ssm_parameter(ssm_parameter: str) -> str:
     try:
-        parameter = ssm_client.get_parameter(Name=ssm_parameter, WithDecryption=True)
-    except ClientError as e:
-        logger.error(e.response["Error"]["Message"])
-        raise e
+        with timed("SsmLookupTime"):
+            parameter = call_aws(
+                "ssm_client",
+                "get_parameter",
+                Name=ssm_parameter,
+                WithDecryption=True,
+            )
+    except Exception as e:
+        if is_client_error(e):
+            logger.error(e.response["Error"]["Message"])
+        raise
 
-    return parameter["Parameter"]["Value"]
+    value = parameter["Parameter"]["Value"]
+    secret_cache.set(ssm_parameter, value)
+    return value
 
 
-def get_pipeline_commit_data(name: str, execution_id: str) -> dict:
+def is_github_revision(revision) -> bool:
+    """
+    Returns True for an artifact revision of a GitHub source the enrichment can describe: it
+    has a revisionId, a revisionUrl naming the FullRepositoryId and a JSON revisionSummary
+    with a CommitMessage. Revisions of other sources, e.g. S3 or ECR, are left out.
+    """
+    if not isinstance(revision, dict):
+        return False
+    revision_id = revision.get("revisionId")
+    revision_url = revision.get("revisionUrl")
+    revision_summary = revision.get("revisionSummary")
+    if not (
+        isinstance(revision_id, str)
+        and revision_id
+        and isinstance(revision_url, str)
+        and isinstance(revision_summary, str)
+    ):
+        return False
+    if not parse_qs(urlparse(revision_url).query).get("FullRepositoryId"):
+        return False
+    try:
+        summary = json.loads(revision_summary)
+    except ValueError:
+        return False
+    return isinstance(summary, dict) and "CommitMessage" in summary
+
+
+def get_github_revisions(artifact_revisions: list) -> list:
+    """
+    Returns the GitHub revisions among a pipeline execution's artifactRevisions, source_output
+    first as it is the standard name given to our GitHub source actions, then the others in
+    pipeline order.
+    """
+    revisions = [
+        revision for revision in artifact_revisions if is_github_revision(revision)
+    ]
+    return sorted(
+        revisions, key=lambda revision: revision.get("name") != "source_output"
+    )
+
+
+def get_pipeline_revisions(name: str, execution_id: str) -> list:
     """
-    Returns map like:
+    Returns the GitHub revisions of a pipeline execution, each a map like:
     {
         "name": "source_output",
         "revisionId": "<REVISION_ID>",
-        "revisionSummary": "lambda-eventbridge-enrichment0.0.12->0.0.15 (#2250)",
-        "revisionUrl": "https://github.com/hmrc/telemetry-terraform/commit/<REVISION_ID>"
+        "revisionSummary": "{\"ProviderType\":\"GitHub\",\"CommitMessage\":\"TEL-3481 ...\"}",
+        "revisionUrl": "https://codestarurl/redirect?...&FullRepositoryId=hmrc/telemetry-terraform&..."
     }
+    Served from the execution cache when the same execution has been looked up before.
     """
+    cache_key = (name, execution_id)
+    revisions = execution_cache.get(cache_key)
+    if revisions is not None:
+        return revisions
+
     try:
-        response = pipeline_client.get_pipeline_execution(
-            pipelineName=name, pipelineExecutionId=execution_id
-        )
-    except ClientError as e:
-        logger.error(e.response["Error"]["Message"])
-        raise e
-
-    # Get the first artifact revision which is the source_output - don't assume there will always be one
-    source_revision_list = [
-        revision
-        for revision in response["pipelineExecution"]["artifactRevisions"]
-        if revision["name"] == "source_output"
-    ]
+        with timed("PipelineExecutionLookupTime"):
+            response = call_aws(
+                "pipeline_client",
+                "get_pipeline_execution",
+                pipelineName=name,
+                pipelineExecutionId=execution_id,
+            )
+    except Exception as e:
+        if is_client_error(e):
+            logger.error(e.response["Error"]["Message"])
+        raise
 
-    # Default revision identifier to empty string, only populate if the artifactRevisions has a 'source_output'
-    # The 'source_output' is the standard name given to all our GitHub Source pipeline steps
-    if len(source_revision_list) > 0:
-        return source_revision_list[0]
-    else:
-        # return empty dictionary
+    revisions = get_github_revisions(response["pipelineExecution"]["artifactRevisions"])
+
+    execution_cache.set(cache_key, revisions)
+    if shared_cache is not None:
+        shared_cache.put("revisions", cache_key, revisions)
+    return revisions
+
+
+def get_pipeline_commit_data(name: str, execution_id: str) -> dict:
+    """
+    Returns the source_output revision of a pipeline execution, in the shape returned by
+    get_pipeline_revisions, or an empty dictionary when there is no GitHub source_output.
+    """
+    for revision in get_pipeline_revisions(name, execution_id):
+        if revision["name"] == "source_output":
+            return revision
+    return {}
+
+
+def get_last_successful_revisions(name: str, execution_id: str) -> dict:
+    """
+    Returns the commit every GitHub source of a pipeline was at when it last succeeded before
+    execution_id started, as a map of repo -> sha. Pages through the pipeline's executions,
+    newest first, until it finds execution_id and then a success that started before it, and
+    gives up with an empty map when the first last_success_max_pages pages do not have both.
+    Served from the last success cache when the execution has been looked up recently.
+    """
+    cache_key = (name, execution_id)
+    revisions = last_success_cache.get(cache_key)
+    if revisions is not None:
+        return revisions
+
+    request = {"pipelineName": name}
+    revisions = {}
+    failed = None
+    succeeded = None
+    with timed("LastSuccessLookupTime"):
+        for _ in range(last_success_max_pages):
+            response = call_aws(
+                "pipeline_client", "list_pipeline_executions", **request
+            )
+            for summary in response.get("pipelineExecutionSummaries", []):
+                if failed is None:
+                    # executions listed before the failing one started after it
+                    if summary.get("pipelineExecutionId") == execution_id:
+                        failed = summary
+                elif summary.get("status") == "Succeeded" and summary.get(
+                    "startTime"
+                ) < failed.get("startTime"):
+                    succeeded = summary
+                    break
+            if succeeded is not None:
+                revisions = {
+                    get_github_repo_from_revision_url(
+                        revision["revisionUrl"]
+                    ): revision["revisionId"]
+                    for revision in succeeded.get("sourceRevisions", [])
+                    if revision.get("revisionId")
+                    and parse_qs(urlparse(revision.get("revisionUrl", "")).query).get(
+                        "FullRepositoryId"
+                    )
+                }
+                break
+            if not response.get("nextToken"):
+                break
+            request["nextToken"] = response["nextToken"]
+
+    last_success_cache.set(cache_key, revisions)
+    return revisions
+
+
+def get_base_revisions(name: str, execution_id: str) -> dict:
+    """
+    Wraps get_last_successful_revisions, returning an empty map when the executions cannot be
+    listed so the failure is attributed to the commits it ran.
+    """
+    try:
+        return get_last_successful_revisions(name, execution_id)
+    except Exception as e:
+        if not (is_client_error(e) or is_github_outage(e)):
+            raise
+        logger.warning(f"Could not find the last successful execution of {name}: {e}")
         return {}
 
 
+def get_event_revisions(detail: dict) -> list | None:
+    """
+    Returns the GitHub revisions when the event detail already carries them, e.g. added by the
+    EventBridge Pipe input transformer, in the same shape as get_pipeline_revisions.
+    detail["artifactRevisions"] is read like the execution's artifactRevisions. Returns None
+    when there is no usable revision, so the caller falls back to get_pipeline_execution.
+    """
+    artifact_revisions = detail.get("artifactRevisions")
+    if not isinstance(artifact_revisions, list):
+        return None
+    return get_github_revisions(artifact_revisions) or None
+
+
 def get_github_repo_from_revision_url(revision_url: str) -> str:
     revision_url_details = urlparse(revision_url)
     return parse_qs(revision_url_details.query)["FullRepositoryId"][0]
 
 
+def get_github_client(
+    github_token: str,
+) -> GitHubCommitClient | PyGithubCommitClient:
+    """
+    Returns the container-wide GitHub client for the token, building a new one (and closing
+    the old one's connections) only when the token has changed, e.g. after a rotation.
+    """
+    global github_client, github_client_token
+
+    with github_client_lock:
+        if github_client is None or github_client_token != github_token:
+            if github_client is not None:
+                github_client.close()
+            client_class = (
+                PyGithubCommitClient
+                if github_client_backend == "pygithub"
+                else GitHubCommitClient
+            )
+            github_client = client_class(
+                github_token,
+                base_url=github_api_url,
+                timeout=github_timeout,
+                pool_size=github_pool_size,
+                rate_limiter=github_rate_limiter,
+                etag_cache_size=github_etag_cache_size,
+                time_left=retry_budget.remaining_ms,
+            )
+            github_client_token = github_token
+        return github_client
+
+
 def get_github_author_email(
     github_token: str, github_repo: str, commit_sha: str
 ) -> str:
+    """
+    Returns the author email of a commit, served from the container-wide author cache
+    when the same (repo, sha) has been looked up before.
+    """
+    cache_key = (github_repo, commit_sha)
+    author_email = author_cache.get(cache_key)
+    if author_email is not None:
+        return author_email
+
+    found = False
     if not commit_sha:
         author_email = "<not found - empty sha>"
     else:
-        g = Github(auth=Auth.Token(github_token))
-        repo = g.get_repo(github_repo)
-        commit = repo.get_commit(sha=commit_sha)
-        author_email = commit.commit.author.email
+        g = get_github_client(github_token)
+        try:
+            with timed("GithubAuthorLookupTime"):
+                author_email = github_circuit_breaker.call(
+                    retry_budget.call,
+                    g.get_commit_author_email,
+                    github_repo,
+                    commit_sha,
+                )
+            found = True
+        except Exception as e:
+            if github_status(e) != 404:
+                raise
+            logger.warning(f"Commit {commit_sha} not found in {github_repo}")
+            author_email = "<not found - unknown commit>"
+        finally:
+            # remaining is -1 until GitHub has answered with rate-limit headers
+            rate_limit_remaining, _ = g.rate_limiting
+            if rate_limit_remaining >= 0:
+                add_metric(
+                    "GithubRateLimitRemaining", MetricUnit.Count, rate_limit_remaining
+                )
+            if not github_keep_alive:
+                # drop the pooled connection so the next lookup opens a fresh one
+                g.close()
+
+    if found:
+        author_cache.set(cache_key, author_email)
+        if shared_cache is not None:
+            shared_cache.put("author", cache_key, author_email)
+    else:
+        author_cache.set(cache_key, author_email, ttl=author_not_found_cache_ttl)
 
     return author_email
 
 
-def enrich_sqs_event(sqs_message: list, context: LambdaContext) -> str:
+def query_github_commit_authors(github_token: str, commits: list) -> dict:
     """
-    Receives an sqs message that contains a CodePipeline event and enriches it.
-    Wraps enrich_codepipeline_event.
+    Resolves the author emails of a list of (repo, sha) pairs with a single aliased GraphQL
+    query. Returns a map of (repo, sha) -> author email containing only the pairs GitHub
+    resolved, partial errors for individual pairs are left for the caller to retry.
+    """
+    declarations = []
+    selections = []
+    variables = {}
+    for index, (github_repo, commit_sha) in enumerate(commits):
+        owner, _, name = github_repo.partition("/")
+        variables.update(
+            {f"owner{index}": owner, f"name{index}": name, f"sha{index}": commit_sha}
+        )
+        declarations.append(
+            f"$owner{index}: String!, $name{index}: String!, $sha{index}: String!"
+        )
+        selections.append(
+            f"c{index}: repository(owner: $owner{index}, name: $name{index}) "
+            f"{{ object(expression: $sha{index}) {{ ... on Commit {{ author {{ email }} }} }} }}"
+        )
+    query = f"query({', '.join(declarations)}) {{ {' '.join(selections)} }}"
+
+    response = github_circuit_breaker.call(
+        retry_budget.call, get_github_client(github_token).graphql, query, variables
+    )
+
+    data = response.get("data") or {}
+    author_emails = {}
+    for index, commit_key in enumerate(commits):
+        repository = data.get(f"c{index}") or {}
+        commit = repository.get("object") or {}
+        author_email = (commit.get("author") or {}).get("email")
+        if author_email:
+            author_emails[commit_key] = author_email
+    return author_emails
+
+
+def get_github_author_emails(github_token: str, commits: list) -> dict:
+    """
+    Batch version of get_github_author_email. Resolves a list of (repo, sha) pairs in aliased
+    GraphQL queries of up to github_graphql_batch_size commits each, instead of a REST call
+    per commit. Any pair GraphQL fails to resolve, including every pair of a query that
+    failed outright, falls back to resolve_commit_author. Returns a map of (repo, sha) ->
+    author email covering every pair, with a placeholder for those GitHub could not be asked
+    about.
+    """
+    author_emails = {}
+    pending = []
+    for commit_key in dict.fromkeys(commits):
+        author_email = author_cache.get(commit_key)
+        if author_email is not None:
+            author_emails[commit_key] = author_email
+        elif commit_key[1]:
+            pending.append(commit_key)
+
+    for start in range(0, len(pending), github_graphql_batch_size):
+        chunk = pending[start : start + github_graphql_batch_size]
+        try:
+            with timed("GithubAuthorBatchLookupTime"):
+                resolved = query_github_commit_authors(github_token, chunk)
+        except Exception as e:
+            # the REST lookups below retry, refresh a rotated token or degrade on their own
+            logger.warning(f"GraphQL author lookup failed, falling back to REST: {e}")
+            resolved = {}
+        for commit_key, author_email in resolved.items():
+            author_cache.set(commit_key, author_email)
+            if shared_cache is not None:
+                shared_cache.put("author", commit_key, author_email)
+        author_emails.update(resolved)
+
+    for github_repo, commit_sha in commits:
+        if (github_repo, commit_sha) not in author_emails:
+            author_emails[(github_repo, commit_sha)] = resolve_commit_author(
+                github_token, github_repo, commit_sha
+            )
+
+    return author_emails
+
+
+def lookup_commit_author_email(
+    github_token: str, github_repo: str, commit_sha: str
+) -> str:
+    """
+    Wraps get_github_author_email, re-fetching the token from SSM and trying once more when
+    GitHub rejects it.
     """
     try:
-        logger.info(f"Lambda Request ID: {context.aws_request_id}")
+        return get_github_author_email(
+            github_token=github_token,
+            github_repo=github_repo,
+            commit_sha=commit_sha,
+        )
+    except Exception as e:
+        if github_status(e) != 401:
+            raise
+        # the cached token has most likely been rotated, so fetch the new one and try again
+        logger.warning("GitHub rejected the cached token, re-fetching it from SSM")
+        github_token = get_ssm_parameter(github_token_param, force_fetch=True)
+        return get_github_author_email(
+            github_token=github_token,
+            github_repo=github_repo,
+            commit_sha=commit_sha,
+        )
+
+
+def resolve_commit_author(github_token: str, github_repo: str, commit_sha: str) -> str:
+    """
+    Wraps lookup_commit_author_email, falling back to a placeholder the Slack lookup maps to the
+    default handle when GitHub is unavailable or rate limited, so the alert still goes out with
+    the pipeline and commit links.
+    """
+    try:
+        return lookup_commit_author_email(github_token, github_repo, commit_sha)
+    except RateLimitedException as e:
+        logger.warning(f"GitHub rate limited, enriching without the commit author: {e}")
+        add_metric("GithubRateLimited", MetricUnit.Count, 1)
+        return "<not found - github rate limited>"
+    except Exception as e:
+        if not (isinstance(e, CircuitOpenException) or is_github_outage(e)):
+            raise
+        logger.warning(f"GitHub unavailable, enriching without the commit author: {e}")
+        return "<not found - github unavailable>"
+
+
+def get_commit_range_authors(
+    github_token: str, github_repo: str, base_sha: str, head_sha: str
+) -> list:
+    """
+    Returns (sha, author email) for every commit after base_sha up to head_sha, oldest first,
+    with a single compare request. The range is kept in the range cache and each of its
+    commits in the author cache, so a later lookup of any of them is served from there.
+    """
+    cache_key = (github_repo, base_sha, head_sha)
+    commit_authors = range_cache.get(cache_key)
+    if commit_authors is not None:
+        return commit_authors
+
+    g = get_github_client(github_token)
+    try:
+        with timed("GithubCompareLookupTime"):
+            commit_authors = github_circuit_breaker.call(
+                retry_budget.call,
+                g.get_compare_commit_authors,
+                github_repo,
+                base_sha,
+                head_sha,
+            )
+    finally:
+        if not github_keep_alive:
+            g.close()
+
+    range_cache.set(cache_key, commit_authors)
+    for commit_sha, author_email in commit_authors:
+        author_cache.set((github_repo, commit_sha), author_email)
+    return commit_authors
+
+
+def resolve_source_authors(
+    github_token: str, github_repo: str, commit_sha: str, base_sha: str | None = None
+) -> list:
+    """
+    Returns (sha, author email) for the commits a failure of one source is attributed to:
+    every commit since base_sha when it is given and the range can be resolved, otherwise
+    the commit the pipeline ran, resolved by resolve_commit_author.
+    """
+    if base_sha and base_sha != commit_sha:
+        try:
+            commit_authors = get_commit_range_authors(
+                github_token, github_repo, base_sha, commit_sha
+            )
+            if commit_authors:
+                return commit_authors
+        except Exception as e:
+            if not (
+                isinstance(e, (RateLimitedException, CircuitOpenException))
+                or is_github_outage(e)
+                or github_status(e) is not None
+            ):
+                raise
+            logger.warning(
+                f"Could not compare {github_repo} {base_sha}...{commit_sha}, "
+                f"attributing the failure to the last commit: {e}"
+            )
+    return [(commit_sha, resolve_commit_author(github_token, github_repo, commit_sha))]
+
+
+def execution_key(event: dict) -> tuple | None:
+    """Returns the (pipeline, execution-id) an event is for, or None if it does not name one."""
+    detail = event.get("detail") or {}
+    if detail.get("pipeline") and detail.get("execution-id"):
+        return detail["pipeline"], detail["execution-id"]
+    return None
+
+
+def event_key(event: dict) -> tuple | None:
+    """
+    Identifies one state change of a pipeline execution: its detail-type, pipeline,
+    execution-id, state, stage and action. It matches the idempotency key, so only repeated
+    deliveries of the same event share it, not the other events of the same execution.
+    """
+    key = execution_key(event)
+    if key is None:
+        return None
+    detail = event["detail"]
+    return (
+        event.get("detail-type"),
+        *key,
+        detail.get("state"),
+        detail.get("stage"),
+        detail.get("action"),
+    )
+
+
+def prefetch_shared_cache(events: list) -> None:
+    """
+    Reads the execution revisions and commit authors a list of events needs from the shared
+    cache into the in-process caches, with one BatchGetItem round trip for the executions and
+    one for the authors of their commits. Entries already cached in-process are not read.
+    """
+    # executions whose events carry their revisions are never looked up, so they are not read
+    event_revisions = {}
+    for event in events:
+        key = execution_key(event)
+        if key is not None:
+            event_revisions[key] = get_event_revisions(event["detail"])
+
+    missing = [
+        key
+        for key, revisions in event_revisions.items()
+        if revisions is None and execution_cache.peek(key) is None
+    ]
+    for key, revisions in shared_cache.get_many("revisions", missing).items():
+        execution_cache.set(key, revisions)
+
+    commits = []
+    for key, revisions in event_revisions.items():
+        if revisions is None:
+            revisions = execution_cache.peek(key) or []
+        for revision in revisions:
+            commit_key = (
+                get_github_repo_from_revision_url(revision["revisionUrl"]),
+                revision["revisionId"],
+            )
+            if author_cache.peek(commit_key) is None:
+                commits.append(commit_key)
+    for commit_key, author_email in shared_cache.get_many("author", commits).items():
+        author_cache.set(commit_key, author_email)
+
+
+def prefetch_commit_authors(events: list) -> None:
+    """
+    Resolves the authors of the commits a batch of events ran with get_github_author_emails
+    before the events are enriched, so the whole batch costs a GraphQL query per
+    github_graphql_batch_size commits instead of a REST call per commit, and enriching each
+    event finds its authors in the author cache. The revisions of every execution are looked
+    up first, concurrently, into the execution cache, skipping executions whose events all
+    have a stored enrichment, see is_enriched. Anything that fails here is left for the
+    enrichment to retry and report.
+    """
+    executions = {}
+    for event in events:
+        key = execution_key(event)
+        if key is not None:
+            executions.setdefault(key, []).append(event)
+
+    def execution_revisions(item: tuple) -> list:
+        (pipeline, execution_id), execution_events = item
+        if all(is_enriched(event) for event in execution_events):
+            return []
+        revisions = get_event_revisions(execution_events[0]["detail"])
+        if revisions is None:
+            revisions = get_pipeline_revisions(pipeline, execution_id)
+        return revisions
+
+    results = run_concurrently(
+        execution_revisions,
+        list(executions.items()),
+        enrichment_concurrency,
+        record_executor,
+    )
+    commits = [
+        (
+            get_github_repo_from_revision_url(revision["revisionUrl"]),
+            revision["revisionId"],
+        )
+        for revisions in results
+        if not isinstance(revisions, Exception)
+        for revision in revisions
+    ]
+    pending = [
+        commit_key
+        for commit_key in dict.fromkeys(commits)
+        if commit_key[1] and author_cache.peek(commit_key) is None
+    ]
+    # a single commit costs one REST call either way
+    if len(pending) < 2:
+        return
+
+    try:
+        github_token = get_ssm_parameter(github_token_param)
+        get_github_author_emails(github_token, pending)
+    except Exception as e:
+        logger.warning(f"Could not resolve the commit authors of the batch: {e}")
+
+
+def record_duplicate(response: dict, data_record) -> dict:
+    """Powertools response hook, called when a stored enrichment is returned for a duplicate."""
+    logger.info("Returning the stored enrichment for a repeated pipeline event")
+    add_metric("DuplicateEvents", MetricUnit.Count, 1)
+    return response
+
+
+def get_idempotent_enrichment():
+    """
+    Returns enrich_codepipeline_failure wrapped with Powertools idempotency, keyed like
+    event_key and building the persistence layer the first time it is needed.
+    """
+    global idempotency_store, idempotency_config, idempotent_enrichment
+
+    if idempotent_enrichment is None:
+        with idempotency_lock:
+            if idempotent_enrichment is None:
+                from aws_lambda_powertools.utilities.idempotency import (
+                    DynamoDBPersistenceLayer,
+                )
+                from aws_lambda_powertools.utilities.idempotency import (
+                    IdempotencyConfig,
+                )
+                from aws_lambda_powertools.utilities.idempotency import (
+                    idempotent_function,
+                )
+                from idempotency_store import InMemoryPersistenceLayer
+
+                if idempotency_table:
+                    idempotency_store = DynamoDBPersistenceLayer(
+                        table_name=idempotency_table,
+                        boto3_client=aws_client("dynamodb_client"),
+                    )
+                else:
+                    idempotency_store = InMemoryPersistenceLayer(
+                        maxsize=int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", "1024"))
+                    )
+                idempotency_config = IdempotencyConfig(
+                    event_key_jmespath=idempotency_key_jmespath,
+                    expires_after_seconds=idempotency_ttl,
+                    # replays are then answered without a round trip to the table
+                    use_local_cache=bool(idempotency_table),
+                    response_hook=record_duplicate,
+                )
+                # configured as the decorator will be, so is_enriched can look records up first
+                idempotency_store.configure(
+                    idempotency_config,
+                    function_name=f"{enrich_codepipeline_failure.__module__}."
+                    f"{enrich_codepipeline_failure.__qualname__}",
+                )
+                idempotent_enrichment = idempotent_function(
+                    enrich_codepipeline_failure,
+                    data_keyword_argument="event",
+                    persistence_store=idempotency_store,
+                    config=idempotency_config,
+                )
+    return idempotent_enrichment
+
+
+def is_enriched(event: dict) -> bool:
+    """
+    Returns True when the idempotency store already holds the finished enrichment of a
+    CodePipeline event, which will be returned without any lookups. An event that cannot be
+    looked up, e.g. while the store is unavailable, counts as not enriched.
+    """
+    if not idempotency_enabled or execution_key(event) is None:
+        return False
+    get_idempotent_enrichment()
+    try:
+        record = idempotency_store.get_record(event)
+    except Exception as e:
+        logger.debug(f"No stored enrichment found for the event: {e}")
+        return False
+    return record is not None and record.status == "COMPLETED"
+
+
+# Every event is routed to the enricher registered for its source and detail-type, so one warm
+# function can serve a mixed stream of events. Enrichers are built by their first event
+enricher_registry = EnricherRegistry()
+
+
+# the default enricher, as every event was before the registry, including those without a source
+@enricher_registry.register("aws.codepipeline", default=True)
+def codepipeline_enricher():
+    """
+    Builds the enricher for CodePipeline events, which enriches each event of a pipeline
+    execution once when idempotency is enabled.
+    """
+    if not idempotency_enabled:
+        return lambda event, context: enrich_codepipeline_failure(event)
+
+    enrich = get_idempotent_enrichment()
+
+    def enrich_pipeline_execution(event: dict, context: LambdaContext) -> dict:
+        if execution_key(event) is None:
+            return enrich_codepipeline_failure(event)
+        # lets a record left in progress by an invocation that timed out be taken over
+        idempotency_config.register_lambda_context(context)
+        return enrich(event=event)
+
+    return enrich_pipeline_execution
+
+
+def enrich_event(event: dict, context: LambdaContext) -> dict:
+    """
+    Enriches a single event with the enricher registered for it. Raises
+    UnsupportedEventException when there is none.
+    """
+    return enricher_registry.enrich(event, context)
+
+
+def start_invocation(context: LambdaContext) -> None:
+    """
+    Per-invocation setup shared by the entry points: decides whether this invocation is
+    sampled for debug logging, arms the retry budget and tags every log with the request ID.
+    """
+    # Powertools re-rolls POWERTOOLS_LOGGER_SAMPLE_RATE here, a sampled invocation logs at DEBUG
+    logger.refresh_sample_rate_calculation()
+    retry_budget.start(context)
+
+    try:
+        logger.append_keys(lambda_request_id=context.aws_request_id)
     except AttributeError:
+        logger.remove_keys(["lambda_request_id"])
         logger.info("No context object available")
 
-    logger.debug(f'Event received from SQS: "{sqs_message}"')
 
-    event = helper.open_sqs_envelope(sqs_message)
-    return enrich_codepipeline_event(event, context)
+def finish_invocation() -> None:
+    """
+    Per-invocation teardown shared by the entry points: waits for the shared cache writes the
+    invocation started, which would otherwise be left frozen with the container. The wait adds
+    up to shared_cache_flush_timeout to the invocation.
+    """
+    if shared_cache is not None:
+        shared_cache.flush(shared_cache_flush_timeout)
+
+
+# Records of an SQS batch failing with these can never be enriched, however often the batch is
+# retried, so they are dropped instead of failing it
+unenrichable_errors = (
+    UnsupportedEventException,
+    EmptyEventDetailException,
+    NoExecutionIdFoundException,
+)
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Returns True for failures a later delivery of the batch may get past: a service being
+    unavailable or throttling, the retry budget running out, or the idempotency store being
+    unavailable or the event being enriched by another invocation. Only idempotency has
+    raised the Powertools errors, so the module is never imported to tell.
+    """
+    if is_github_outage(error):
+        return True
+    exceptions = sys.modules.get(
+        "aws_lambda_powertools.utilities.idempotency.exceptions"
+    )
+    return exceptions is not None and isinstance(
+        error,
+        (
+            exceptions.IdempotencyAlreadyInProgressError,
+            exceptions.IdempotencyInconsistentStateError,
+            exceptions.IdempotencyPersistenceLayerError,
+        ),
+    )
+
+
+def unenriched_event(event: dict) -> dict:
+    """Returns a CodePipeline event as it is passed on when it cannot be enriched, headed only."""
+    pipeline = (event.get("detail") or {}).get("pipeline")
+    return dict(event, **{"message-header": f"CodePipeline failed: {pipeline}"})
+
+
+@log_metrics
+@profiler.profile
+@timed("BatchEnrichmentTime")
+def enrich_sqs_event(sqs_message: list, context: LambdaContext) -> list:
+    """
+    Receives a batch of sqs messages that each contain an EventBridge event and enriches them.
+    Wraps enrich_event, so each event goes to the enricher registered for it.
+
+    Every record in the batch is enriched independently, and concurrently with the others, at
+    most enrichment_concurrency at a time. Records repeating a pipeline event already in the
+    batch, as told by event_key, are collapsed into the first one: they are not enriched or
+    returned again, and fail the batch with it if it failed transiently. The commit authors of
+    the whole batch are resolved together first, see prefetch_commit_authors.
+
+    Returns the enriched events in batch order, a JSON array the pipe sends on to its target
+    one event at a time. A pipe enrichment cannot report partial batch failures, so records
+    that can never be enriched (an undecodable body, an unsupported or incomplete event) are
+    logged and dropped rather than holding the batch back. Records that fail for good, e.g.
+    their pipeline was deleted, are passed on with only their message-header, see
+    unenriched_event. Only a transient failure, see is_transient, raises
+    BatchEnrichmentException once the rest of the batch is done, for the pipe to retry the
+    batch. The records enriched in the meantime are answered from the idempotency store then.
+    """
+    start_invocation(context)
+    logger.info("Enriching SQS batch", extra={"records": len(sqs_message)})
+    logger.debug("Event received from SQS", extra={"sqs_message": sqs_message})
+    add_metric("EventsPerBatch", MetricUnit.Count, len(sqs_message))
+
+    # records that cannot be opened are reported as failures in batch order below
+    events = []
+    for sqs_record in sqs_message:
+        try:
+            events.append(helper.open_sqs_record(sqs_record))
+        except Exception as e:
+            events.append(e)
+    if shared_cache is not None:
+        prefetch_shared_cache([event for event in events if isinstance(event, dict)])
+
+    # only the first record of each event is enriched, the rest are collapsed into it
+    first_records = {}
+    to_enrich = []
+    for index, event in enumerate(events):
+        if isinstance(event, Exception):
+            continue
+        key = event_key(event) if isinstance(event, dict) else None
+        if key is not None:
+            if key in first_records:
+                continue
+            first_records[key] = index
+        to_enrich.append(index)
+
+    try:
+        # with commit range attribution the authors come from compare requests instead
+        if not commit_range_attribution:
+            prefetch_commit_authors([events[index] for index in to_enrich])
+        results = run_concurrently(
+            lambda index: enrich_event(events[index], context),
+            to_enrich,
+            enrichment_concurrency,
+            record_executor,
+        )
+    finally:
+        finish_invocation()
+    outcomes = dict(zip(to_enrich, results))
+
+    enriched_events = []
+    dropped = 0
+    unenriched = 0
+    failed_message_ids = []
+    for index, (sqs_record, event) in enumerate(zip(sqs_message, events)):
+        message_id = sqs_record.get("messageId")
+        if isinstance(event, Exception):
+            outcome = event
+        elif index in outcomes:
+            outcome = outcomes[index]
+        else:
+            logger.info(
+                "Collapsed duplicate SQS record", extra={"message_id": message_id}
+            )
+            add_metric("DuplicateEvents", MetricUnit.Count, 1)
+            outcome = outcomes[first_records[event_key(event)]]
+            if not (isinstance(outcome, Exception) and is_transient(outcome)):
+                continue
+
+        if not isinstance(outcome, Exception):
+            enriched_events.append(outcome)
+        elif isinstance(event, Exception) or isinstance(outcome, unenrichable_errors):
+            logger.error(
+                "Dropping SQS record that cannot be enriched",
+                exc_info=outcome,
+                extra={"message_id": message_id},
+            )
+            dropped += 1
+        elif is_transient(outcome):
+            logger.error(
+                "Failed to enrich SQS record",
+                exc_info=outcome,
+                extra={"message_id": message_id},
+            )
+            failed_message_ids.append(message_id)
+        else:
+            logger.error(
+                "Passing on SQS record without its enrichment",
+                exc_info=outcome,
+                extra={"message_id": message_id},
+            )
+            unenriched += 1
+            enriched_events.append(unenriched_event(event))
+    add_metric("DroppedEvents", MetricUnit.Count, dropped)
+    add_metric("UnenrichedEvents", MetricUnit.Count, unenriched)
+    add_metric("FailedEvents", MetricUnit.Count, len(failed_message_ids))
+
+    if failed_message_ids:
+        raise BatchEnrichmentException(failed_message_ids)
+    return enriched_events
 
 
-def enrich_codepipeline_event(event: dict, context: LambdaContext) -> str:
+@log_metrics
+@profiler.profile
+def enrich_codepipeline_event(event: dict, context: LambdaContext) -> dict:
+    """
+    Receives a single EventBridge event, CodePipeline or any other registered kind, and
+    enriches it. Wraps enrich_event.
+    """
+    start_invocation(context)
+    if shared_cache is not None and isinstance(event, dict):
+        prefetch_shared_cache([event])
+    try:
+        return enrich_event(event, context)
+    finally:
+        finish_invocation()
+
+
+@timed("EventEnrichmentTime")
+def enrich_codepipeline_failure(event: dict) -> dict:
     """
     Enriches a CodePipeline event with:
     1. Execution ID
     2. Slack user of the person making the commit
     """
-    try:
-        logger.info(f"Lambda Request ID: {context.aws_request_id}")
-    except AttributeError:
-        logger.info("No context object available")
-
-    logger.debug(f'Event received from CodePipeline: "{event}"')
+    logger.debug("Event received from CodePipeline", extra={"event": event})
 
     if not event.get("detail"):
         logger.error("No detail found in event, cannot continue")
@@ -133,40 +1245,106 @@ def enrich_codepipeline_event(event: dict, context: LambdaContext) -> str:
 
     event["message-header"] = f"CodePipeline failed: {pipeline}"
 
-    # get github client credentials
-    github_token = get_ssm_parameter(github_token_param)
+    # get GitHub commit details from execution id and the github client credentials, the
+    # credentials are only needed when there is a commit to look up
+    github_token_future = None
+    if concurrent_lookups:
+        github_token_future = lookup_executor.submit(
+            get_ssm_parameter, github_token_param
+        )
 
-    # get GitHub commit details from execution id
-    commit_data = get_pipeline_commit_data(pipeline, execution_id)
-    if len(commit_data.keys()) == 0:
+    # the API is only asked for the revisions when the event does not already carry them
+    revisions = get_event_revisions(detail)
+    if revisions is None:
+        revisions = get_pipeline_revisions(pipeline, execution_id)
+    else:
+        logger.debug("Using the source revisions carried by the event")
+    if not revisions:
         # did not get any github commit details so just return event as is
+        if github_token_future is not None:
+            github_token_future.cancel()
         return event
 
-    commit_sha = commit_data["revisionId"]
-    logger.debug(f"commit_sha: {commit_sha}")
+    if github_token_future is not None:
+        github_token = github_token_future.result()
+    else:
+        github_token = get_ssm_parameter(github_token_param)
 
     # get GitHub repo name from revision URL
-    github_repo = get_github_repo_from_revision_url(commit_data["revisionUrl"])
+    commits = [
+        (
+            get_github_repo_from_revision_url(revision["revisionUrl"]),
+            revision["revisionId"],
+        )
+        for revision in revisions
+    ]
+    logger.debug("Resolved commit shas", extra={"commits": commits})
 
-    # get commit author(s) from sha
-    author_email = get_github_author_email(
-        github_token=github_token,
-        github_repo=github_repo,
-        commit_sha=commit_sha,
+    # with commit range attribution every commit since the last success is looked at
+    base_shas = (
+        get_base_revisions(pipeline, execution_id) if commit_range_attribution else {}
     )
 
-    # translate git email -> slack id (simple lookup)
-    slack_handle = helper.get_slack_handle(author_email)
-    commit_url = f"https://github.com/{github_repo}/commit/{commit_sha}"
-    revision_summary = json.loads(commit_data["revisionSummary"])
-    commit_message_summary = revision_summary["CommitMessage"].partition("\n")[0]
+    # get commit author(s) from sha, the authors of a multi-source pipeline are looked up at the
+    # same time so every extra source costs no more latency than the slowest lookup
+    def source_authors(commit: tuple) -> list:
+        github_repo, commit_sha = commit
+        return resolve_source_authors(
+            github_token, github_repo, commit_sha, base_shas.get(github_repo)
+        )
+
+    if len(commits) == 1:
+        authors = [source_authors(commits[0])]
+    else:
+        authors = list(lookup_executor.map(source_authors, commits))
+
     pipeline_url = f"https://eu-west-2.console.aws.amazon.com/codesuite/codepipeline/pipelines/{pipeline}/view"
+    sources = []
+    for revision, (github_repo, commit_sha), commit_authors in zip(
+        revisions, commits, authors
+    ):
+        # translate git email -> slack id (simple lookup), mentioning each person once
+        slack_handles = dict.fromkeys(
+            helper.get_slack_handle(author_email) for _, author_email in commit_authors
+        )
+        mentions = ", ".join(f"<@{slack_handle}>" for slack_handle in slack_handles)
+        commit_url = f"https://github.com/{github_repo}/commit/{commit_sha}"
+        revision_summary = json.loads(revision["revisionSummary"])
+        commit_message_summary = revision_summary["CommitMessage"].partition("\n")[0]
+        commit_range = None
+        if len(commit_authors) > 1:
+            compare_url = f"https://github.com/{github_repo}/compare/{base_shas[github_repo]}...{commit_sha}"
+            commit_range = f"<{compare_url}|{len(commit_authors)} commits>"
+        sources.append(
+            (
+                github_repo,
+                mentions,
+                f"<{commit_url}|{commit_message_summary}>",
+                commit_range,
+            )
+        )
+
+    if len(sources) == 1:
+        _, mentions, commit_link, commit_range = sources[0]
+        if commit_range is None:
+            text = f"Build of <{pipeline_url}|{pipeline}> failed after a commit by {mentions} - {commit_link}"
+        else:
+            text = f"Build of <{pipeline_url}|{pipeline}> failed after {commit_range} by {mentions} - {commit_link}"
+    else:
+        text = (
+            f"Build of <{pipeline_url}|{pipeline}> failed after commits to {len(sources)} sources:"
+            + "".join(
+                f"\n• {github_repo}: {mentions} - {commit_link}"
+                + ("" if commit_range is None else f" ({commit_range})")
+                for github_repo, mentions, commit_link, commit_range in sources
+            )
+        )
 
     event["message-content"] = {
         "mrkdwn_in": ["text"],
         "color": "danger",
-        "text": f"Build of <{pipeline_url}|{pipeline}> failed after a commit by <@{slack_handle}> - <{commit_url}|{commit_message_summary}>",
+        "text": text,
     }
-    logger.debug(f'Final enriched event: "{event}"')
+    logger.debug("Final enriched event", extra={"enriched_event": event})
 
     return event
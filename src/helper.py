@@ -1,5 +1,7 @@
 import json
 
+from identity_directory import IdentityDirectory
+
 
 class Helper:
     github_to_slack = {
@@ -13,19 +15,32 @@ class Helper:
     def __init__(
         self,
         logger,
+        identity_directory: IdentityDirectory | None = None,
     ):
         self.logger = logger
+        # Without an externally loaded directory only the built-in users are known
+        self.identity_directory = identity_directory or IdentityDirectory(
+            defaults=self.github_to_slack
+        )
 
     def get_slack_handle(self, github_email: str) -> str:
         # Default to telemetry-engineers if it's an unknown user
-        slack_handle = "telemetry-engineers"
-        if github_email in self.github_to_slack:
-            slack_handle = self.github_to_slack[github_email]
+        slack_handle = (
+            self.identity_directory.get(github_email) or "telemetry-engineers"
+        )
+        # %-style arguments are only formatted when debug logging is enabled
         self.logger.debug(
-            f"Returned Slack handle {slack_handle} for GitHub email {github_email}"
+            "Returned Slack handle %s for GitHub email %s", slack_handle, github_email
         )
         return slack_handle
 
+    def open_sqs_record(self, sqs_record: dict) -> dict:
+        """
+        SQS records are like an "envelope" wrapping the message we want.
+        This method "opens" the "envelope" and returns the message body.
+        """
+        return json.loads(sqs_record.get("body"))
+
     def open_sqs_envelope(self, sqs_message: list) -> dict:
         """
         SQS messages are like an "envelope" wrapping the message we want.
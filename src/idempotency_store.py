@@ -0,0 +1,67 @@
+import threading
+import time
+
+from aws_lambda_powertools.utilities.idempotency import BasePersistenceLayer
+from aws_lambda_powertools.utilities.idempotency.exceptions import (
+    IdempotencyItemAlreadyExistsError,
+)
+from aws_lambda_powertools.utilities.idempotency.exceptions import (
+    IdempotencyItemNotFoundError,
+)
+from aws_lambda_powertools.utilities.idempotency.persistence.datarecord import (
+    DataRecord,
+)
+from aws_lambda_powertools.utilities.idempotency.persistence.datarecord import (
+    STATUS_CONSTANTS,
+)
+from cache import LRUCache
+
+
+class InMemoryPersistenceLayer(BasePersistenceLayer):
+    """
+    Powertools idempotency persistence layer that keeps records in the Lambda container.
+
+    Records live as long as the container and are only seen by the invocations it serves, so
+    duplicates that land on another instance are enriched again. It needs no table, which makes
+    it the default, and follows the same rules as the DynamoDB layer: a record can be replaced
+    once it has expired, or while in progress once the invocation that wrote it has timed out.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        super().__init__()
+        self._records = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def _get_record(self, idempotency_key) -> DataRecord:
+        data_record = self._records.peek(idempotency_key)
+        if data_record is None:
+            raise IdempotencyItemNotFoundError
+        return data_record
+
+    def _put_record(self, data_record: DataRecord) -> None:
+        with self._lock:
+            existing = self._records.peek(data_record.idempotency_key)
+            if existing is not None and not self.is_replaceable(existing):
+                raise IdempotencyItemAlreadyExistsError(old_data_record=existing)
+            self._records.set(data_record.idempotency_key, data_record)
+
+    def _update_record(self, data_record: DataRecord) -> None:
+        with self._lock:
+            self._records.set(data_record.idempotency_key, data_record)
+
+    def _delete_record(self, data_record: DataRecord) -> None:
+        with self._lock:
+            self._records.invalidate(data_record.idempotency_key)
+
+    @staticmethod
+    def is_replaceable(data_record: DataRecord) -> bool:
+        if data_record.is_expired:
+            return True
+        return (
+            data_record.status == STATUS_CONSTANTS["INPROGRESS"]
+            and data_record.in_progress_expiry_timestamp is not None
+            and data_record.in_progress_expiry_timestamp < int(time.time() * 1000)
+        )
+
+    def clear(self) -> None:
+        self._records.clear()
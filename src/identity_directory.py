@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+NOREPLY_DOMAIN = "users.noreply.github.com"
+
+
+def normalise_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def github_user_id(email: str) -> str | None:
+    """
+    Returns the numeric GitHub user ID from a noreply address like
+    1253988+nisartahir@users.noreply.github.com, which stays the same when the login changes.
+    """
+    local_part, _, domain = normalise_email(email).partition("@")
+    user_id, plus, _ = local_part.partition("+")
+    if domain == NOREPLY_DOMAIN and plus and user_id.isdigit():
+        return user_id
+    return None
+
+
+class IdentityDirectory:
+    """
+    GitHub to Slack identity directory, loaded once per container and reloaded after ttl seconds.
+
+    The source is a JSON object mapping GitHub emails to Slack handles, read from a local file
+    path, an SSM parameter (ssm:/parameter/name) or an S3 object (s3://bucket/key). Entries are
+    indexed by normalised email and by the numeric GitHub user ID of noreply addresses, so
+    lookups are dictionary hits however large the directory grows. The defaults are always
+    indexed underneath the loaded entries, and if a load fails the previous index is kept.
+
+    A reload runs on the lookup that finds the directory stale, so SSM and S3 sources are read
+    with the client get_client returns for "ssm" or "s3", which should have timeouts that fit
+    the invocation. Without it a boto3 client with botocore's defaults is built per reload.
+    """
+
+    def __init__(
+        self,
+        source: str | None = None,
+        ttl: float = 900,
+        defaults: dict | None = None,
+        logger=None,
+        get_client=None,
+    ):
+        self.source = source
+        self.ttl = ttl
+        self.defaults = defaults or {}
+        self.logger = logger
+        self.get_client = get_client or self.boto3_client
+        self._by_email, self._by_github_id = self.build_index(self.defaults)
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build_index(mapping: dict) -> tuple:
+        by_email = {}
+        by_github_id = {}
+        for email, slack_handle in mapping.items():
+            by_email[normalise_email(email)] = slack_handle
+            user_id = github_user_id(email)
+            if user_id is not None:
+                by_github_id[user_id] = slack_handle
+        return by_email, by_github_id
+
+    @staticmethod
+    def boto3_client(service: str):
+        import boto3
+
+        return boto3.client(service, region_name="eu-west-2")
+
+    def get(self, github_email: str | None) -> str | None:
+        """Returns the Slack handle for a GitHub email, or None if the person is not in the directory."""
+        # a commit without a GitHub author has no email to look up
+        if not isinstance(github_email, str):
+            return None
+        self.reload_if_stale()
+        by_email, by_github_id = self._by_email, self._by_github_id
+
+        slack_handle = by_email.get(normalise_email(github_email))
+        if slack_handle is None:
+            user_id = github_user_id(github_email)
+            if user_id is not None:
+                slack_handle = by_github_id.get(user_id)
+        return slack_handle
+
+    def reload_if_stale(self) -> None:
+        if self.source is None:
+            return
+        if (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.ttl
+        ):
+            return
+
+        with self._lock:
+            # another thread may have reloaded while this one waited for the lock
+            if (
+                self._loaded_at is not None
+                and time.monotonic() - self._loaded_at < self.ttl
+            ):
+                return
+            try:
+                mapping = {**self.defaults, **json.loads(self.read_source())}
+                self._by_email, self._by_github_id = self.build_index(mapping)
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.error(
+                        f"Could not load identity directory from {self.source}: {e}"
+                    )
+            # a failed load is not retried until the ttl passes again
+            self._loaded_at = time.monotonic()
+
+    def read_source(self) -> str:
+        # boto3 is only imported for the SSM and S3 sources, which are read once per ttl
+        if self.source.startswith("s3://"):
+            location = urlparse(self.source)
+            response = self.get_client("s3").get_object(
+                Bucket=location.netloc, Key=location.path.lstrip("/")
+            )
+            return response["Body"].read()
+
+        if self.source.startswith("ssm:"):
+            response = self.get_client("ssm").get_parameter(
+                Name=self.source.removeprefix("ssm:"), WithDecryption=True
+            )
+            return response["Parameter"]["Value"]
+
+        with open(self.source) as directory_file:
+            return directory_file.read()
@@ -0,0 +1,101 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from aws_lambda_powertools import Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+
+# Metrics are written to stdout in CloudWatch embedded metric format (EMF) and turned into
+# CloudWatch metrics by the Lambda log pipeline, so recording them never makes a network call
+metrics = Metrics(
+    namespace=os.environ.get("POWERTOOLS_METRICS_NAMESPACE", "Telemetry"),
+    service="aws-lambda-telemetry-eventbridge-enrichment",
+)
+
+_lock = threading.Lock()
+_in_flight = 0
+_tracked_caches = {}
+_tracked_counters = {}
+
+
+def add_metric(name: str, unit: MetricUnit, value: float) -> None:
+    # lookups running on the thread pools record metrics too
+    with _lock:
+        metrics.add_metric(name=name, unit=unit, value=value)
+
+
+@contextmanager
+def timed(metric_name: str):
+    """Records how long the block took, in milliseconds, whether or not it raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_metric(
+            metric_name, MetricUnit.Milliseconds, (time.perf_counter() - start) * 1000
+        )
+
+
+def track_cache(name: str, cache) -> None:
+    """Reports the hit ratio of an LRUCache as <name>CacheHitRatio every time metrics are flushed."""
+    _tracked_caches[name] = [cache, cache.hits, cache.misses]
+
+
+def track_counter(name: str, read_count) -> None:
+    """Reports how much a running counter grew since the last flush, read_count returns its value."""
+    _tracked_counters[name] = [read_count, read_count()]
+
+
+def record_tracked() -> None:
+    for name, tracked in _tracked_caches.items():
+        cache, last_hits, last_misses = tracked
+        hits, misses = cache.hits, cache.misses
+        # the counters start again from zero when a cache is cleared
+        hits_delta = hits - last_hits if hits >= last_hits else hits
+        misses_delta = misses - last_misses if misses >= last_misses else misses
+        tracked[1:] = [hits, misses]
+        if hits_delta + misses_delta > 0:
+            add_metric(
+                f"{name}CacheHitRatio",
+                MetricUnit.Percent,
+                100 * hits_delta / (hits_delta + misses_delta),
+            )
+
+    for name, tracked in _tracked_counters.items():
+        read_count, last_count = tracked
+        count = read_count()
+        tracked[1] = count
+        add_metric(name, MetricUnit.Count, max(count - last_count, 0))
+
+
+def flush_metrics() -> None:
+    record_tracked()
+    with _lock:
+        if metrics.metric_set:
+            metrics.flush_metrics()
+
+
+def log_metrics(entry_point):
+    """
+    Flushes the metrics once the outermost instrumented entry point returns, so an SQS batch
+    that enriches many events still writes a single EMF document per invocation.
+    """
+
+    @functools.wraps(entry_point)
+    def wrapper(*args, **kwargs):
+        global _in_flight
+
+        with _lock:
+            _in_flight += 1
+        try:
+            return entry_point(*args, **kwargs)
+        finally:
+            with _lock:
+                _in_flight -= 1
+                outermost = _in_flight == 0
+            if outermost:
+                flush_metrics()
+
+    return wrapper
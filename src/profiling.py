@@ -0,0 +1,188 @@
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+
+def short_path(filename: str) -> str:
+    # the package directory is enough to tell library frames apart
+    return os.path.join(*filename.split(os.sep)[-2:])
+
+
+def frame_name(code, lineno: int) -> str:
+    return f"{short_path(code.co_filename)}:{lineno} {code.co_name}"
+
+
+class Profiler:
+    """
+    Profiles a sample of invocations to show where their time and memory go.
+
+    Each invocation of a profiled entry point is picked with probability sample_rate, when it
+    is 0 the entry point is called straight through. A picked
+    invocation is sampled every interval seconds from a background thread that records the
+    stack of every thread running code under one of paths, which covers the records and
+    lookups running on the thread pools, unlike cProfile that only sees the calling thread.
+    The share of samples a frame was executing, top_self, and was on the stack, top_cumulative,
+    together with the process CPU time against the wall time tell CPU work apart from waiting
+    on I/O. With trace_memory tracemalloc reports the peak and the lines that allocated most.
+
+    The top top_n entries are logged as "Invocation profile", or written as JSON to a file in
+    output_dir when it is set.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        interval: float = 0.005,
+        top_n: int = 15,
+        trace_memory: bool = True,
+        output_dir: str | None = None,
+        paths: tuple = (os.path.dirname(os.path.abspath(__file__)),),
+        logger=None,
+    ):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.top_n = top_n
+        self.trace_memory = trace_memory
+        self.output_dir = output_dir
+        self.paths = paths
+        self.logger = logger
+        self._active = False
+        self._lock = threading.Lock()
+
+    def should_profile(self) -> bool:
+        if self.sample_rate <= 0:
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate  # nosec B311
+
+    def profile(self, entry_point):
+        """Decorates an entry point so a sample of its invocations is profiled."""
+
+        @functools.wraps(entry_point)
+        def wrapper(*args, **kwargs):
+            if not self.should_profile():
+                return entry_point(*args, **kwargs)
+            with self._lock:
+                # concurrent or nested entry points are left to the invocation already profiled
+                nested = self._active
+                self._active = True
+            if nested:
+                return entry_point(*args, **kwargs)
+            try:
+                return self.run(entry_point, args, kwargs)
+            finally:
+                with self._lock:
+                    self._active = False
+
+        return wrapper
+
+    def run(self, entry_point, args: tuple, kwargs: dict):
+        self_counts = Counter()
+        cumulative_counts = Counter()
+        sampled = [0]
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self.sample,
+            args=(stop, self_counts, cumulative_counts, sampled),
+            name="profiler",
+            daemon=True,
+        )
+
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        sampler.start()
+        try:
+            return entry_point(*args, **kwargs)
+        finally:
+            stop.set()
+            sampler.join()
+            wall_ms = (time.perf_counter() - wall_start) * 1000
+            cpu_ms = (time.process_time() - cpu_start) * 1000
+            summary = {
+                "entry_point": entry_point.__name__,
+                "wall_ms": round(wall_ms, 1),
+                "cpu_ms": round(cpu_ms, 1),
+                "samples": sampled[0],
+                "top_self": self.top(self_counts, sampled[0]),
+                "top_cumulative": self.top(cumulative_counts, sampled[0]),
+            }
+            if self.trace_memory:
+                summary["memory"] = self.memory_summary()
+                if started_tracing:
+                    tracemalloc.stop()
+            self.report(summary)
+
+    def sample(
+        self,
+        stop: threading.Event,
+        self_counts: Counter,
+        cumulative_counts: Counter,
+        sampled: list,
+    ) -> None:
+        own_thread = threading.get_ident()
+        while not stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame)
+                    frame = frame.f_back
+                # idle pool threads and anything else not running our code are skipped
+                if not any(f.f_code.co_filename.startswith(self.paths) for f in stack):
+                    continue
+                sampled[0] += 1
+                leaf = stack[0]
+                self_counts[frame_name(leaf.f_code, leaf.f_lineno)] += 1
+                # a recursive function counts once per sample
+                cumulative_counts.update(
+                    {frame_name(f.f_code, f.f_code.co_firstlineno) for f in stack}
+                )
+
+    def top(self, counts: Counter, total: int) -> list:
+        return [
+            {"frame": name, "samples": count, "share": round(count / total, 3)}
+            for name, count in counts.most_common(self.top_n)
+        ]
+
+    def memory_summary(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        statistics = snapshot.statistics("lineno")
+        return {
+            "current_kib": round(current / 1024, 1),
+            "peak_kib": round(peak / 1024, 1),
+            "top": [
+                {
+                    "line": f"{short_path(statistic.traceback[0].filename)}:"
+                    f"{statistic.traceback[0].lineno}",
+                    "size_kib": round(statistic.size / 1024, 1),
+                    "count": statistic.count,
+                }
+                for statistic in statistics[: self.top_n]
+            ],
+        }
+
+    def report(self, summary: dict) -> None:
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(
+                self.output_dir,
+                f"profile-{summary['entry_point']}-{time.time_ns()}.json",
+            )
+            with open(path, "w") as profile_file:
+                json.dump(summary, profile_file)
+            if self.logger is not None:
+                self.logger.info("Invocation profile written", extra={"path": path})
+        elif self.logger is not None:
+            self.logger.info("Invocation profile", extra={"profile": summary})
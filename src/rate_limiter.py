@@ -0,0 +1,89 @@
+import threading
+import time
+
+from exceptions import RateLimitedException
+
+
+class RateLimiter:
+    """
+    Token bucket in front of a rate-limited API, paced by the quota the API reports.
+
+    Requests take a token from a bucket of burst tokens that refills at rate tokens per
+    second. After every response update() is given the remaining quota and the epoch second it
+    resets at, and the refill rate is lowered so what is left above the reserve lasts until the
+    reset. Once the remaining quota drops to the reserve, acquire() raises RateLimitedException
+    until the reset, leaving the reserve for requests that cannot be avoided. Conditional
+    requests the API answers for free, e.g. with 304 Not Modified, can still be let through.
+    """
+
+    def __init__(
+        self,
+        rate: float = 10,
+        burst: int = 20,
+        reserve: int = 100,
+        max_wait: float = 1,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.remaining = -1
+        self.reset_at = 0.0
+        self._refill_rate = rate
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def quota_low(self) -> bool:
+        """True while the reported quota is down to the reserve and has not reset yet."""
+        return 0 <= self.remaining <= self.reserve and time.time() < self.reset_at
+
+    def update(self, remaining: int, reset_at: float) -> None:
+        """Records the remaining quota and when it resets, as reported by the last response."""
+        with self._lock:
+            self.remaining = remaining
+            self.reset_at = reset_at
+            seconds_to_reset = max(reset_at - time.time(), 1)
+            spendable = max(remaining - self.reserve, 0)
+            self._refill_rate = max(min(self.rate, spendable / seconds_to_reset), 0.01)
+
+    def acquire(self, conditional: bool = False) -> None:
+        """
+        Takes a token, waiting up to max_wait seconds for one. Raises RateLimitedException when
+        the quota is low, unless the request is conditional, or when no token arrives in time.
+        """
+        if self.quota_low and not conditional:
+            raise RateLimitedException(
+                f"Rate limit quota down to {self.remaining}, reserved until {self.reset_at:.0f}"
+            )
+
+        with self._lock:
+            now = time.monotonic()
+            if self.quota_low or time.time() >= self.reset_at:
+                refill_rate = self.rate
+            else:
+                refill_rate = self._refill_rate
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._refilled_at) * refill_rate
+            )
+            self._refilled_at = now
+
+            wait = (1 - self._tokens) / refill_rate if self._tokens < 1 else 0.0
+            if wait > self.max_wait:
+                raise RateLimitedException(
+                    f"No request token available within {self.max_wait}s"
+                )
+            # the token is taken now, so callers waiting at the same time queue up behind it
+            self._tokens -= 1
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.remaining = -1
+            self.reset_at = 0.0
+            self._refill_rate = self.rate
+            self._tokens = float(self.burst)
+            self._refilled_at = time.monotonic()
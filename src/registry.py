@@ -0,0 +1,92 @@
+import threading
+
+from exceptions import UnsupportedEventException
+
+
+class Enricher:
+    """
+    An enricher registered for a kind of event, built by its factory the first time it is used.
+
+    The factory returns the function that enriches an event, called with the event and the
+    Lambda context, and is where the enricher sets up the clients and layers it depends on, so
+    a container only pays for the event types it actually receives.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self._enrich = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._enrich is None:
+            with self._lock:
+                if self._enrich is None:
+                    self._enrich = self.factory()
+        return self._enrich
+
+    def reset(self) -> None:
+        with self._lock:
+            self._enrich = None
+
+
+class EnricherRegistry:
+    """
+    Dispatches EventBridge events to the enricher registered for their source and detail-type.
+
+    Enrichers are registered at import time, which builds the dispatch table, so routing an
+    event costs at most two dictionary lookups: one for its source and detail-type and, when
+    there is no such enricher, one for an enricher of every event from its source.
+    """
+
+    def __init__(self):
+        self._enrichers = {}
+
+    def register(
+        self, source: str, detail_type: str | None = None, default: bool = False
+    ):
+        """
+        Decorates the factory of the enricher for events from source with detail_type, or for
+        every event from source that has no enricher of its own when detail_type is None. A
+        default enricher also takes events without a source, e.g. reshaped by an input
+        transformer that left it out.
+        """
+
+        def decorate(factory):
+            enricher = Enricher(factory.__name__, factory)
+            self._enrichers[(source, detail_type)] = enricher
+            if default:
+                self._enrichers[(None, None)] = enricher
+            return factory
+
+        return decorate
+
+    def lookup(self, event) -> Enricher:
+        if not isinstance(event, dict):
+            raise UnsupportedEventException(f"Cannot enrich a {type(event).__name__}")
+        source = event.get("source")
+        detail_type = event.get("detail-type")
+        enricher = self._enrichers.get((source, detail_type)) or self._enrichers.get(
+            (source, None)
+        )
+        if enricher is None:
+            raise UnsupportedEventException(
+                f"No enricher registered for {detail_type!r} events from {source!r}"
+            )
+        return enricher
+
+    def supports(self, event) -> bool:
+        try:
+            self.lookup(event)
+        except UnsupportedEventException:
+            return False
+        return True
+
+    def enrich(self, event, context):
+        """Enriches the event with its enricher, building the enricher if this is its first event."""
+        return self.lookup(event).get()(event, context)
+
+    def reset(self) -> None:
+        """Drops the built enrichers so each is built again by its next event."""
+        for enricher in self._enrichers.values():
+            enricher.reset()
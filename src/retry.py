@@ -0,0 +1,128 @@
+import random
+import sys
+import time
+
+from exceptions import RetryBudgetExhaustedException
+
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "SlowDown",
+}
+
+
+def botocore_error(error: Exception, *names: str) -> bool:
+    """
+    Returns True when error is one of the named botocore exceptions. Only a process that has
+    imported botocore can have raised one, so botocore is never imported to tell.
+    """
+    exceptions = sys.modules.get("botocore.exceptions")
+    return exceptions is not None and isinstance(
+        error, tuple(getattr(exceptions, name) for name in names)
+    )
+
+
+def is_client_error(error: Exception) -> bool:
+    """Returns True for an error response from an AWS API."""
+    return botocore_error(error, "ClientError")
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Returns True for throttling, server-side and connection errors from the AWS and GitHub
+    calls, which are worth retrying, and False for anything the caller got wrong.
+    """
+    if is_client_error(error):
+        status_code = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        return error.response["Error"]["Code"] in THROTTLING_ERROR_CODES or (
+            status_code is not None and status_code >= 500
+        )
+    if botocore_error(error, "ConnectionError", "HTTPClientError"):
+        return True
+    # GitHub API errors carry the HTTP status of the response
+    status = getattr(error, "status", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(error, OSError)
+
+
+class RetryBudget:
+    """
+    Retry policy bounded by the time left in the current Lambda invocation.
+
+    The budget is armed at the start of every invocation from
+    context.get_remaining_time_in_millis(). Retryable errors are retried with capped,
+    jittered exponential backoff, but only while the backoff still fits before the deadline
+    minus reserve_ms, which is kept back so the invocation can finish and return. Once the
+    budget is used up RetryBudgetExhaustedException is raised instead of letting Lambda kill
+    the invocation, which would make SQS redeliver the event and pay for every retry twice.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay_ms: int = 100,
+        max_delay_ms: int = 2000,
+        reserve_ms: int = 1000,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay_ms = base_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.reserve_ms = reserve_ms
+        self.retries = 0
+        self._deadline = None
+
+    def start(self, context) -> None:
+        """Arms the budget with the deadline of the invocation the context belongs to."""
+        try:
+            remaining_ms = context.get_remaining_time_in_millis()
+        except AttributeError:
+            remaining_ms = 0
+
+        # Contexts that report no remaining time (local invocations, test doubles) have no deadline
+        if remaining_ms > 0:
+            self._deadline = time.monotonic() + (remaining_ms - self.reserve_ms) / 1000
+        else:
+            self._deadline = None
+
+    def remaining_ms(self) -> float | None:
+        """Returns the milliseconds left to spend on calls, or None when there is no deadline."""
+        if self._deadline is None:
+            return None
+        return (self._deadline - time.monotonic()) * 1000
+
+    def call(self, operation, *args, **kwargs):
+        """Calls operation(*args, **kwargs), retrying retryable errors within the budget."""
+        operation_name = getattr(operation, "__name__", repr(operation))
+        attempt = 1
+        while True:
+            remaining_ms = self.remaining_ms()
+            if remaining_ms is not None and remaining_ms <= 0:
+                raise RetryBudgetExhaustedException(
+                    f"No time left in the invocation to call {operation_name}"
+                )
+
+            try:
+                return operation(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_attempts:
+                    raise
+
+                delay_ms = random.uniform(  # nosec B311
+                    0, min(self.max_delay_ms, self.base_delay_ms * 2**attempt)
+                )
+                remaining_ms = self.remaining_ms()
+                if remaining_ms is not None and remaining_ms < delay_ms:
+                    raise RetryBudgetExhaustedException(
+                        f"Retry budget exhausted after {attempt} attempt(s) of {operation_name} "
+                        f"with {max(remaining_ms, 0):.0f}ms of the invocation left"
+                    ) from e
+
+                time.sleep(delay_ms / 1000)
+                attempt += 1
+                self.retries += 1
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from concurrent.futures import wait
+
+# BatchGetItem reads at most 100 keys per request
+batch_get_limit = 100
+
+
+class SharedCache:
+    """
+    Second cache tier shared by every Lambda instance, stored in a DynamoDB table.
+
+    The in-process caches only help warm invocations, so a burst fanned out to many cold
+    instances would otherwise resolve the same commits once per instance. Values are stored
+    as JSON under "<kind>#<key parts>" in the table's cache_key partition key, with an
+    expires_at epoch second the table's TTL setting deletes them by. Reads are batched with
+    BatchGetItem. Writes are handed to the executor, which should be the cache's own so they
+    do not hold up other work queued on it, and flush waits for the ones still pending, adding
+    up to its timeout to the caller. Errors talking to the table are logged and treated as
+    misses, the cache is never required.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        get_client,
+        ttl: float = 604800,
+        executor=None,
+        logger=None,
+    ):
+        self.table_name = table_name
+        # called on first use so the DynamoDB client is only built when the cache is used
+        self.get_client = get_client
+        self.ttl = ttl
+        self.executor = executor
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(kind: str, key: tuple) -> str:
+        return "#".join([kind, *key])
+
+    def get_many(self, kind: str, keys: list) -> dict:
+        """Returns a map of key -> value for the keys found in the table and not yet expired."""
+        cache_keys = {self.cache_key(kind, key): key for key in dict.fromkeys(keys)}
+        pending = list(cache_keys)
+        found = {}
+        now = time.time()
+
+        try:
+            for start in range(0, len(pending), batch_get_limit):
+                request = {
+                    self.table_name: {
+                        "Keys": [
+                            {"cache_key": {"S": cache_key}}
+                            for cache_key in pending[start : start + batch_get_limit]
+                        ]
+                    }
+                }
+                # keys DynamoDB could not read in time are asked for again, a couple of times
+                for _ in range(3):
+                    response = self.get_client().batch_get_item(RequestItems=request)
+                    for item in response["Responses"].get(self.table_name, []):
+                        # the TTL setting deletes expired items lazily, so they can still be read
+                        if float(item["expires_at"]["N"]) > now:
+                            key = cache_keys[item["cache_key"]["S"]]
+                            found[key] = json.loads(item["cache_value"]["S"])
+                    request = response.get("UnprocessedKeys")
+                    if not request:
+                        break
+        except Exception as e:
+            if self.logger is not None:
+                self.logger.warning(
+                    f"Could not read the shared cache {self.table_name}: {e}"
+                )
+
+        self.hits += len(found)
+        self.misses += len(cache_keys) - len(found)
+        return found
+
+    def put(self, kind: str, key: tuple, value, ttl: float | None = None):
+        """Writes value for key in the background, returns the write's future if there is an executor."""
+        ttl = self.ttl if ttl is None else ttl
+        item = {
+            "cache_key": {"S": self.cache_key(kind, key)},
+            "cache_value": {"S": json.dumps(value)},
+            "expires_at": {"N": str(int(time.time() + ttl))},
+        }
+        if self.executor is None:
+            return self.write(item)
+        future = self.executor.submit(self.write, item)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self.written)
+        return future
+
+    def written(self, future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    def flush(self, timeout: float) -> None:
+        """Waits up to timeout seconds for the background writes still pending."""
+        with self._lock:
+            pending = list(self._pending)
+        if not pending:
+            return
+        _, not_done = wait(pending, timeout=timeout)
+        if not_done and self.logger is not None:
+            self.logger.warning(
+                f"{len(not_done)} writes to the shared cache {self.table_name} "
+                f"did not finish within {timeout}s"
+            )
+
+    def write(self, item: dict) -> None:
+        try:
+            self.get_client().put_item(TableName=self.table_name, Item=item)
+        except Exception as e:
+            if self.logger is not None:
+                self.logger.warning(
+                    f"Could not write to the shared cache {self.table_name}: {e}"
+                )
@@ -0,0 +1,217 @@
+import json
+import os
+import time
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from aws_lambda_context import LambdaContext
+from tests.stand_ins import reset_container_state
+
+region = "eu-west-2"
+baseline_file = Path(__file__).parent / "baseline.json"
+
+# Injected latency of the stubbed clients, in milliseconds
+aws_latency_ms = float(os.environ.get("BENCHMARK_AWS_LATENCY_MS", "2"))
+github_latency_ms = float(os.environ.get("BENCHMARK_GITHUB_LATENCY_MS", "5"))
+
+# How far a result may move past the baseline before the benchmark fails, as a fraction
+tolerance = float(os.environ.get("BENCHMARK_TOLERANCE", "0.5"))
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get("RUN_BENCHMARKS", "").lower() == "true":
+        return
+    skip = pytest.mark.skip(reason="set RUN_BENCHMARKS=true to run the benchmarks")
+    for item in items:
+        # only skip the benchmarks themselves, not the ruff checks of their files
+        if isinstance(item, pytest.Function) and "tests/benchmark" in str(item.path):
+            item.add_marker(skip)
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class StubClient:
+    """Stands in for a boto3 client, answering every operation after the injected latency."""
+
+    def __init__(self, responses: dict, latency_ms: float):
+        self.responses = responses
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def __getattr__(self, operation):
+        if operation not in self.responses:
+            raise AttributeError(operation)
+
+        def call(**kwargs):
+            self.calls += 1
+            time.sleep(self.latency_ms / 1000)
+            return self.responses[operation](**kwargs)
+
+        return call
+
+
+def github_commit_author(latency_ms: float):
+    def get_commit_author_email(github_repo, commit_sha):
+        time.sleep(latency_ms / 1000)
+        return f"{commit_sha[:8]}@example.com"
+
+    return get_commit_author_email
+
+
+def github_graphql(latency_ms: float):
+    def graphql(query, variables):
+        time.sleep(latency_ms / 1000)
+        commits = len(variables) // 3
+        return {
+            "data": {
+                f"c{index}": {
+                    "object": {
+                        "author": {
+                            "email": f"{variables[f'sha{index}'][:8]}@example.com"
+                        }
+                    }
+                }
+                for index in range(commits)
+            }
+        }
+
+    return graphql
+
+
+@pytest.fixture
+def context():
+    lambda_context = LambdaContext()
+    lambda_context.function_name = "lambda_handler"
+    lambda_context.aws_request_id = "abc-123"
+    return lambda_context
+
+
+@pytest.fixture(scope="session")
+def benchmark_results():
+    """
+    Collects the results of every benchmark and compares them with the stored baseline.
+    Set BENCHMARK_UPDATE_BASELINE=true to store the results of this run as the new baseline.
+    """
+    results = {}
+    yield results
+
+    print(json.dumps(results, indent=2))
+    if os.environ.get("BENCHMARK_UPDATE_BASELINE", "").lower() == "true":
+        baseline_file.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture(scope="session")
+def baseline():
+    if not baseline_file.exists():
+        return {}
+    return json.loads(baseline_file.read_text())
+
+
+@pytest.fixture
+def record(benchmark_results, baseline):
+    """Records a result and fails if it has regressed past the baseline by more than the tolerance."""
+
+    def record_result(name: str, value: float, higher_is_better: bool = False):
+        benchmark_results[name] = round(value, 3)
+        expected = baseline.get(name)
+        if (
+            expected is None
+            or os.environ.get("BENCHMARK_UPDATE_BASELINE", "").lower() == "true"
+        ):
+            return
+        if higher_is_better:
+            assert value >= expected * (
+                1 - tolerance
+            ), f"{name} regressed: {value:.3f} < baseline {expected}"
+        else:
+            assert value <= expected * (
+                1 + tolerance
+            ), f"{name} regressed: {value:.3f} > baseline {expected}"
+
+    return record_result
+
+
+@pytest.fixture
+def stubbed_handler(monkeypatch):
+    """Returns the handler module with its SSM, CodePipeline and GitHub clients stubbed out."""
+    os.environ.setdefault("AWS_DEFAULT_REGION", region)
+    import handler
+
+    def get_pipeline_execution(pipelineName, pipelineExecutionId):
+        sha = pipelineExecutionId.replace("-", "").ljust(40, "0")[:40]
+        return {
+            "pipelineExecution": {
+                "pipelineName": pipelineName,
+                "pipelineExecutionId": pipelineExecutionId,
+                "artifactRevisions": [
+                    {
+                        "name": "source_output",
+                        "revisionId": sha,
+                        "revisionSummary": '{"ProviderType":"GitHub","CommitMessage":"TEL-1 benchmark\\n\\nbody"}',
+                        "revisionUrl": "https://codestarurl/redirect?connectionArn=blah&referenceType=COMMIT&"
+                        f"FullRepositoryId=hmrc/telemetry-terraform&Commit={sha[:7]}",
+                    }
+                ],
+            }
+        }
+
+    ssm_client = StubClient(
+        {"get_parameter": lambda **kwargs: {"Parameter": {"Value": "token123"}}},
+        aws_latency_ms,
+    )
+    pipeline_client = StubClient(
+        {"get_pipeline_execution": get_pipeline_execution}, aws_latency_ms
+    )
+    github_client = mock.Mock()
+    github_client.rate_limiting = (4999, 5000)
+    github_client.get_commit_author_email.side_effect = github_commit_author(
+        github_latency_ms
+    )
+    github_client.graphql.side_effect = github_graphql(github_latency_ms)
+
+    monkeypatch.setattr(handler, "ssm_client", ssm_client)
+    monkeypatch.setattr(handler, "pipeline_client", pipeline_client)
+    monkeypatch.setattr(
+        handler, "get_github_client", lambda github_token: github_client
+    )
+    # every benchmark starts from, and leaves behind, a fresh container
+    reset_container_state(handler)
+    yield handler
+    reset_container_state(handler)
+
+
+def codepipeline_event(index: int) -> dict:
+    return {
+        "version": "0",
+        "id": f"event-{index}",
+        "detail-type": "CodePipeline Pipeline Execution State Change",
+        "source": "aws.codepipeline",
+        "account": "123456789012",
+        "time": "2017-04-22T03:31:47Z",
+        "region": region,
+        "resources": [
+            "arn:aws:codepipeline:eu-west-2:123456789012:pipeline:myPipeline"
+        ],
+        "detail": {
+            "pipeline": f"pipeline-{index % 25}",
+            "version": "1",
+            "state": "FAILED",
+            "execution-id": f"{index:08d}-0123-0123-0123-012345678901",
+        },
+    }
+
+
+def sqs_record(index: int) -> dict:
+    return {
+        "messageId": f"message-{index}",
+        "receiptHandle": "SQS_RECEIPT_HANDLE",
+        "body": json.dumps(codepipeline_event(index)),
+        "attributes": {"ApproximateReceiveCount": "1"},
+        "messageAttributes": {},
+        "eventSource": "aws:sqs",
+        "awsRegion": region,
+    }
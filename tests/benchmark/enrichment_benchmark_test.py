@@ -0,0 +1,102 @@
+import re
+import subprocess  # nosec B404
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from tests.benchmark.conftest import codepipeline_event
+from tests.benchmark.conftest import percentile
+from tests.benchmark.conftest import sqs_record
+
+events = 200
+batch_size = 10
+src_dir = Path(__file__).parents[2] / "src"
+
+
+def test_enrich_codepipeline_event_latency(stubbed_handler, context, record):
+    """Per-event latency of a warm container enriching failures of distinct commits"""
+    # warm up the container: token cache, GitHub client and imports
+    stubbed_handler.enrich_codepipeline_event(codepipeline_event(-1), context)
+
+    samples = []
+    for index in range(events):
+        event = codepipeline_event(index)
+        start = time.perf_counter()
+        enriched_event = stubbed_handler.enrich_codepipeline_event(event, context)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert "message-content" in enriched_event
+
+    record("codepipeline_event_p50_ms", percentile(samples, 0.50))
+    record("codepipeline_event_p99_ms", percentile(samples, 0.99))
+
+
+def test_enrich_sqs_event_batch_throughput(stubbed_handler, context, record):
+    """Events enriched per second when SQS delivers full batches"""
+    batches = [
+        [sqs_record(index + offset) for offset in range(batch_size)]
+        for index in range(0, events, batch_size)
+    ]
+
+    start = time.perf_counter()
+    for batch in batches:
+        response = stubbed_handler.enrich_sqs_event(batch, context)
+        assert len(response) == batch_size
+    elapsed = time.perf_counter() - start
+
+    record("sqs_batch_events_per_second", events / elapsed, higher_is_better=True)
+
+
+def test_enrich_codepipeline_event_allocations(stubbed_handler, context, record):
+    """Memory allocated while enriching one event, excluding the injected latency"""
+    stubbed_handler.enrich_codepipeline_event(codepipeline_event(-1), context)
+
+    tracemalloc.start()
+    try:
+        peaks = []
+        blocks = []
+        for index in range(50):
+            tracemalloc.reset_peak()
+            before_size, _ = tracemalloc.get_traced_memory()
+            before = tracemalloc.take_snapshot()
+            stubbed_handler.enrich_codepipeline_event(
+                codepipeline_event(index), context
+            )
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - before_size) / 1024)
+            blocks.append(
+                sum(
+                    stat.count_diff
+                    for stat in after.compare_to(before, "filename")
+                    if stat.count_diff > 0
+                )
+            )
+    finally:
+        tracemalloc.stop()
+
+    record("codepipeline_event_peak_kib", percentile(peaks, 0.50))
+    record("codepipeline_event_retained_blocks", percentile(blocks, 0.50))
+
+
+def test_handler_import_time(record):
+    """Cold start cost of importing the handler module in a fresh interpreter"""
+    samples = []
+    for _ in range(3):
+        result = subprocess.run(  # nosec B603
+            [sys.executable, "-X", "importtime", "-c", "import handler"],
+            cwd=src_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+            env={"PYTHONPATH": str(src_dir), "AWS_DEFAULT_REGION": "eu-west-2"},
+        )
+        # the last line for a top-level import holds its cumulative time in microseconds
+        handler_line = [
+            line
+            for line in result.stderr.splitlines()
+            if re.search(r"\|\s*handler$", line)
+        ][-1]
+        samples.append(int(handler_line.split("|")[1]) / 1000)
+
+    record("handler_import_ms", min(samples))
@@ -0,0 +1,422 @@
+"""
+Local stand-ins for the services the enrichment calls, with scripted latency, errors and
+rate limits, so the retry, caching and concurrency paths can be exercised offline.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from botocore.exceptions import ClientError
+
+
+def fixed(ms: float):
+    """Latency distribution that always answers after ms milliseconds."""
+    return lambda rng: ms / 1000
+
+
+def uniform(low_ms: float, high_ms: float):
+    """Latency distribution spread evenly between low_ms and high_ms."""
+    return lambda rng: rng.uniform(low_ms, high_ms) / 1000
+
+
+def lognormal(median_ms: float, sigma: float = 0.5):
+    """Long-tailed latency distribution like a real API, centred on median_ms."""
+    return lambda rng: rng.lognormvariate(0, sigma) * median_ms / 1000
+
+
+class FaultInjector:
+    """
+    Decides how each request to a stand-in is answered.
+
+    script is a list of error statuses (or None for success) used up by the first requests,
+    e.g. [503, 503] for a short storm, after which requests fail at error_rate with a status
+    picked from error_statuses. Every request waits a delay drawn from latency. A seeded random
+    generator makes a run repeatable.
+    """
+
+    def __init__(
+        self,
+        latency=fixed(0),
+        error_rate: float = 0.0,
+        error_statuses: tuple = (500, 502, 503),
+        script: list | None = None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.script = list(script or [])
+        self.rng = random.Random(seed)  # nosec B311
+        self._lock = threading.Lock()
+
+    def next_fault(self) -> int | None:
+        """Sleeps for the drawn latency and returns the error status to answer with, if any."""
+        with self._lock:
+            delay = self.latency(self.rng)
+            if self.script:
+                status = self.script.pop(0)
+            elif self.rng.random() < self.error_rate:
+                status = self.rng.choice(self.error_statuses)
+            else:
+                status = None
+        # not time.sleep, which tests patch to skip retry backoff
+        threading.Event().wait(delay)
+        return status
+
+
+class GitHubStandIn:
+    """
+    HTTP server answering the GitHub REST and GraphQL requests the enrichment makes:
+    GET /repos/{owner}/{repo}/commits/{sha}, GET /repos/{owner}/{repo}/compare/{base}...{head}
+    and POST /graphql with aliased commit lookups.
+
+    authors maps (repo, sha) to the author email. Commits not in it are found with the email
+    <sha[:8]>@example.com unless unknown_commits_found is False, in which case they are 404s.
+    ranges maps (repo, base, head) to the shas of the commits after base up to head, oldest
+    first, ranges not in it compare as the single commit head.
+    Responses carry an ETag and If-None-Match is answered with 304, which like GitHub does not
+    use up the rate limit. Every other answered request counts down rate_limit, reported in
+    the X-RateLimit headers, and once it reaches zero requests are refused with 403.
+    """
+
+    def __init__(
+        self,
+        authors: dict | None = None,
+        faults: FaultInjector | None = None,
+        rate_limit: int = 5000,
+        unknown_commits_found: bool = True,
+        ranges: dict | None = None,
+    ):
+        self.authors = authors or {}
+        self.ranges = ranges or {}
+        self.faults = faults or FaultInjector()
+        self.rate_limit = rate_limit
+        self.remaining = rate_limit
+        self.reset_at = int(time.time()) + 3600
+        self.unknown_commits_found = unknown_commits_found
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self.request_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "GitHubStandIn":
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def author_of(self, repo: str, sha: str) -> str | None:
+        if (repo, sha) in self.authors:
+            return self.authors[(repo, sha)]
+        return f"{sha[:8]}@example.com" if self.unknown_commits_found else None
+
+    def rate_limit_headers(self, counted: bool) -> dict:
+        with self._lock:
+            if counted and self.remaining > 0:
+                self.remaining -= 1
+            remaining = self.remaining
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(self.reset_at),
+            "X-RateLimit-Resource": "core",
+        }
+
+    def request_handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, status: int, body: dict | None, headers: dict) -> None:
+                payload = b"" if body is None else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def answer(self, respond) -> None:
+                with stand_in._lock:
+                    stand_in.requests.append((self.command, self.path))
+                status = stand_in.faults.next_fault()
+                if status is not None:
+                    self.reply(
+                        status,
+                        {"message": "Injected fault"},
+                        stand_in.rate_limit_headers(counted=True),
+                    )
+                    return
+                if stand_in.remaining <= 0:
+                    self.reply(
+                        403,
+                        {"message": "API rate limit exceeded"},
+                        stand_in.rate_limit_headers(counted=False),
+                    )
+                    return
+                respond()
+
+            def do_GET(self):
+                self.answer(self.get)
+
+            def do_POST(self):
+                self.answer(self.graphql)
+
+            def get(self):
+                if "/compare/" in self.path:
+                    self.compare()
+                else:
+                    self.get_commit()
+
+            def compare(self):
+                match = re.fullmatch(
+                    r"/repos/([^/]+/[^/]+)/compare/([^/.?]+)\.\.\.([^/?]+).*", self.path
+                )
+                if match is None:
+                    self.reply(404, {"message": "Not Found"}, {})
+                    return
+                repo, base, head = match.groups()
+                shas = stand_in.ranges.get((repo, base, head), [head])
+                commits = [
+                    {
+                        "sha": sha,
+                        "commit": {"author": {"email": stand_in.author_of(repo, sha)}},
+                    }
+                    for sha in shas
+                ]
+                self.reply(
+                    200,
+                    {"total_commits": len(commits), "commits": commits},
+                    stand_in.rate_limit_headers(counted=True),
+                )
+
+            def get_commit(self):
+                match = re.fullmatch(
+                    r"/repos/([^/]+/[^/]+)/commits/([^/?]+).*", self.path
+                )
+                if match is None:
+                    self.reply(404, {"message": "Not Found"}, {})
+                    return
+                repo, sha = match.groups()
+                email = stand_in.author_of(repo, sha)
+                if email is None:
+                    self.reply(
+                        404,
+                        {"message": f"No commit found for SHA: {sha}"},
+                        stand_in.rate_limit_headers(counted=True),
+                    )
+                    return
+                etag = f'"{sha}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.reply(304, None, stand_in.rate_limit_headers(counted=False))
+                    return
+                headers = {**stand_in.rate_limit_headers(counted=True), "ETag": etag}
+                self.reply(
+                    200, {"sha": sha, "commit": {"author": {"email": email}}}, headers
+                )
+
+            def graphql(self):
+                length = int(self.headers.get("Content-Length", 0))
+                variables = json.loads(self.rfile.read(length)).get("variables", {})
+                data = {}
+                index = 0
+                while f"sha{index}" in variables:
+                    repo = f"{variables[f'owner{index}']}/{variables[f'name{index}']}"
+                    email = stand_in.author_of(repo, variables[f"sha{index}"])
+                    commit = {"author": {"email": email}} if email else None
+                    data[f"c{index}"] = {"object": commit}
+                    index += 1
+                headers = stand_in.rate_limit_headers(counted=True)
+                headers["X-RateLimit-Resource"] = "graphql"
+                self.reply(200, {"data": data}, headers)
+
+        return Handler
+
+
+class CodePipelineFake:
+    """
+    Stands in for the CodePipeline boto3 client, answering get_pipeline_execution and
+    list_pipeline_executions.
+
+    executions maps (pipeline, execution-id) to the execution's artifactRevisions. Executions
+    not in it get a single GitHub source_output revision for hmrc/<pipeline>. histories maps a
+    pipeline to its execution summaries, newest first, listed page_size at a time, and those
+    without a startTime are given one a minute apart in that order. Pipelines not in it list
+    the executions looked up with get_pipeline_execution as failed, newest first, after the
+    execution "last-success" succeeded. Pipelines in deleted_pipelines are answered with
+    PipelineNotFoundException. Injected faults are raised as ClientErrors, 400 as
+    ThrottlingException and anything else as a server error. Calls are recorded in calls and
+    list_calls.
+    """
+
+    def __init__(
+        self,
+        executions: dict | None = None,
+        faults: FaultInjector | None = None,
+        histories: dict | None = None,
+        page_size: int = 100,
+    ):
+        self.executions = executions or {}
+        self.histories = histories or {}
+        self.deleted_pipelines = set()
+        self.page_size = page_size
+        self.faults = faults or FaultInjector()
+        self.calls = []
+        self.list_calls = []
+        self._lock = threading.Lock()
+
+    epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    @staticmethod
+    def source_revision(pipeline: str, execution_id: str) -> dict:
+        sha = hashlib.sha1(
+            f"{pipeline}/{execution_id}".encode(), usedforsecurity=False
+        ).hexdigest()
+        return {
+            "name": "source_output",
+            "revisionId": sha,
+            "revisionSummary": json.dumps(
+                {
+                    "ProviderType": "GitHub",
+                    "CommitMessage": f"Change for {execution_id}",
+                }
+            ),
+            "revisionUrl": "https://codestarurl/redirect?referenceType=COMMIT&"
+            f"FullRepositoryId=hmrc/{pipeline}&Commit={sha}",
+        }
+
+    @classmethod
+    def execution_summary(cls, pipeline: str, execution_id: str, status: str) -> dict:
+        revision = cls.source_revision(pipeline, execution_id)
+        return {
+            "pipelineExecutionId": execution_id,
+            "status": status,
+            "sourceRevisions": [
+                {
+                    "actionName": "Source",
+                    "revisionId": revision["revisionId"],
+                    "revisionSummary": revision["revisionSummary"],
+                    "revisionUrl": revision["revisionUrl"],
+                }
+            ],
+        }
+
+    def inject_fault(self, operation: str) -> None:
+        status = self.faults.next_fault()
+        if status is not None:
+            code = "ThrottlingException" if status == 400 else "InternalFailure"
+            raise ClientError(
+                {
+                    "Error": {"Code": code, "Message": "Injected fault"},
+                    "ResponseMetadata": {"HTTPStatusCode": status},
+                },
+                operation,
+            )
+
+    def check_exists(self, pipeline: str, operation: str) -> None:
+        if pipeline in self.deleted_pipelines:
+            raise ClientError(
+                {
+                    "Error": {
+                        "Code": "PipelineNotFoundException",
+                        "Message": f"Pipeline {pipeline} not found",
+                    },
+                    "ResponseMetadata": {"HTTPStatusCode": 400},
+                },
+                operation,
+            )
+
+    def get_pipeline_execution(self, pipelineName: str, pipelineExecutionId: str):
+        with self._lock:
+            self.calls.append((pipelineName, pipelineExecutionId))
+        self.inject_fault("GetPipelineExecution")
+        self.check_exists(pipelineName, "GetPipelineExecution")
+
+        key = (pipelineName, pipelineExecutionId)
+        revisions = self.executions.get(key)
+        if revisions is None:
+            revisions = [self.source_revision(*key)]
+        return {
+            "pipelineExecution": {
+                "pipelineName": pipelineName,
+                "pipelineExecutionId": pipelineExecutionId,
+                "status": "Failed",
+                "artifactRevisions": revisions,
+            }
+        }
+
+    def list_pipeline_executions(
+        self, pipelineName: str, maxResults: int = 100, nextToken: str | None = None
+    ):
+        with self._lock:
+            self.list_calls.append((pipelineName, nextToken))
+        self.inject_fault("ListPipelineExecutions")
+        self.check_exists(pipelineName, "ListPipelineExecutions")
+
+        history = self.histories.get(pipelineName)
+        if history is None:
+            with self._lock:
+                looked_up = [
+                    execution_id
+                    for pipeline, execution_id in reversed(self.calls)
+                    if pipeline == pipelineName
+                ]
+            history = [
+                self.execution_summary(pipelineName, execution_id, "Failed")
+                for execution_id in dict.fromkeys(looked_up)
+            ] + [self.execution_summary(pipelineName, "last-success", "Succeeded")]
+        history = [
+            dict(
+                {"startTime": self.epoch - timedelta(minutes=position)},
+                **summary,
+            )
+            for position, summary in enumerate(history)
+        ]
+        start = int(nextToken or 0)
+        end = start + min(maxResults, self.page_size)
+        response = {"pipelineExecutionSummaries": history[start:end]}
+        if end < len(history):
+            response["nextToken"] = str(end)
+        return response
+
+
+def reset_container_state(handler) -> None:
+    """
+    Puts the handler back in the state of a fresh container: empties its caches, idempotency
+    records and registry, resets the breaker and rate limiter, and drops the per-deadline AWS
+    clients and the GitHub client with its ETag cache.
+    """
+    handler.secret_cache.clear()
+    handler.author_cache.clear()
+    handler.execution_cache.clear()
+    handler.last_success_cache.clear()
+    handler.range_cache.clear()
+    handler.deadline_clients.clear()
+    handler.github_circuit_breaker.reset()
+    handler.github_rate_limiter.reset()
+    handler.enricher_registry.reset()
+    if handler.idempotency_store is not None:
+        handler.idempotency_store.clear()
+    # not closed, a concurrent invocation may still be using its connections
+    handler.github_client = None
+    handler.github_client_token = None
@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+from cache import LRUCache
+
+
+def test_get_returns_stored_value_and_counts_hits_and_misses():
+    """Test that stored values are returned and lookups are counted"""
+    cache = LRUCache(maxsize=2)
+
+    cache.set("foo", "bar")
+
+    assert cache.get("foo") == "bar"
+    assert cache.get("missing") is None
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Test that the cache never grows past maxsize and evicts the least recently used entry"""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+@patch("cache.time.monotonic")
+def test_entries_expire_after_ttl(mock_monotonic):
+    """Test that entries expire after the cache-wide TTL or their own TTL"""
+    mock_monotonic.return_value = 100.0
+    cache = LRUCache(ttl=10)
+    cache.set("default-ttl", "value")
+    cache.set("short-ttl", "value", ttl=1)
+
+    mock_monotonic.return_value = 105.0
+
+    assert cache.get("default-ttl") == "value"
+    assert cache.get("short-ttl") is None
+
+    mock_monotonic.return_value = 111.0
+
+    assert cache.get("default-ttl") is None
+    assert len(cache) == 0
+
+
+def test_peek_does_not_count_lookups_or_refresh_recency():
+    """Test that peek returns a value without touching the counters or eviction order"""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.peek("a") == 1
+    assert cache.peek("missing") is None
+    cache.set("c", 3)
+
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert cache.peek("a") is None
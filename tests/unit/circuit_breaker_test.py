@@ -0,0 +1,104 @@
+from unittest import mock
+from unittest.mock import patch
+
+import pytest
+from circuit_breaker import CircuitBreaker
+from circuit_breaker import CLOSED
+from circuit_breaker import HALF_OPEN
+from circuit_breaker import OPEN
+from exceptions import CircuitOpenException
+from exceptions import RateLimitedException
+
+
+def failing_call():
+    raise TimeoutError("GitHub timed out")
+
+
+def test_breaker_opens_after_failure_threshold():
+    """Test that consecutive failures open the breaker and further calls are rejected"""
+    breaker = CircuitBreaker("GitHub", failure_threshold=2)
+
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            breaker.call(failing_call)
+
+    operation = mock.Mock()
+    with pytest.raises(CircuitOpenException):
+        breaker.call(operation)
+    assert breaker.state == OPEN
+    operation.assert_not_called()
+
+
+def test_errors_that_are_not_failures_do_not_open_the_breaker():
+    """Test that only errors matching is_failure count against the dependency"""
+    breaker = CircuitBreaker(
+        "GitHub",
+        failure_threshold=1,
+        is_failure=lambda error: isinstance(error, TimeoutError),
+    )
+
+    with pytest.raises(ValueError):
+        breaker.call(mock.Mock(side_effect=ValueError("not found")))
+
+    assert breaker.state == CLOSED
+
+
+@patch("circuit_breaker.time.monotonic")
+def test_half_open_probe_closes_breaker_on_success(mock_monotonic):
+    """Test that a single probe is let through after the reset timeout and closes the breaker"""
+    mock_monotonic.return_value = 100.0
+    breaker = CircuitBreaker("GitHub", failure_threshold=1, reset_timeout=30)
+    with pytest.raises(TimeoutError):
+        breaker.call(failing_call)
+
+    mock_monotonic.return_value = 131.0
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.call(lambda: "author") == "author"
+
+
+@patch("circuit_breaker.time.monotonic")
+def test_half_open_probe_reopens_breaker_on_failure(mock_monotonic):
+    """Test that a failing probe opens the breaker for another reset timeout"""
+    mock_monotonic.return_value = 100.0
+    breaker = CircuitBreaker("GitHub", failure_threshold=1, reset_timeout=30)
+    with pytest.raises(TimeoutError):
+        breaker.call(failing_call)
+
+    mock_monotonic.return_value = 131.0
+    with pytest.raises(TimeoutError):
+        breaker.call(failing_call)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+
+@patch("circuit_breaker.time.monotonic")
+def test_half_open_probe_that_never_reached_the_dependency_leaves_the_breaker_half_open(
+    mock_monotonic,
+):
+    """Test that a probe held back by the rate limiter neither closes nor re-opens the breaker"""
+    mock_monotonic.return_value = 100.0
+    breaker = CircuitBreaker(
+        "GitHub",
+        failure_threshold=1,
+        reset_timeout=30,
+        is_failure=lambda error: isinstance(error, TimeoutError),
+        is_unsent=lambda error: isinstance(error, RateLimitedException),
+    )
+    with pytest.raises(TimeoutError):
+        breaker.call(failing_call)
+
+    mock_monotonic.return_value = 131.0
+    with pytest.raises(RateLimitedException):
+        breaker.call(mock.Mock(side_effect=RateLimitedException("throttled")))
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.failures == 1
+    with pytest.raises(TimeoutError):
+        breaker.call(failing_call)
+    assert breaker.state == OPEN
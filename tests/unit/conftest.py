@@ -1,4 +1,5 @@
 import os
+import sys
 from datetime import datetime
 from datetime import timedelta
 
@@ -7,6 +8,9 @@ import pytest
 from aws_lambda_context import LambdaContext
 from botocore.stub import Stubber
 from moto import mock_aws
+from tests.stand_ins import CodePipelineFake
+from tests.stand_ins import GitHubStandIn
+from tests.stand_ins import reset_container_state
 
 region = "eu-west-2"
 
@@ -16,6 +20,16 @@ def initialise_environment_variables():
     os.environ["LOG_LEVEL"] = "DEBUG"
 
 
+@pytest.fixture(autouse=True)
+def clear_container_caches():
+    """Caches live for the lifetime of the container, so reset them between tests."""
+    yield
+    # Only reset a handler that a test has imported, importing it here would create its clients early
+    handler = sys.modules.get("handler")
+    if handler is not None:
+        reset_container_state(handler)
+
+
 @pytest.fixture(scope="function")
 def lambda_event():
     return {}
@@ -47,6 +61,45 @@ def ssm(aws_credentials):
         yield conn
 
 
+@pytest.fixture(scope="function")
+def dynamodb(aws_credentials):
+    with mock_aws():
+        conn = boto3.client("dynamodb", region_name="eu-west-2")
+        conn.create_table(
+            TableName="enrichment-cache",
+            KeySchema=[{"AttributeName": "cache_key", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "cache_key", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield conn
+
+
+@pytest.fixture(scope="function")
+def github_stand_in(monkeypatch):
+    """
+    Local GitHub server the handler's GitHub client is pointed at. Script its latency, faults
+    and rate limit through its attributes, e.g. github_stand_in.faults = FaultInjector(...).
+    """
+    import handler
+
+    stand_in = GitHubStandIn().start()
+    monkeypatch.setattr(handler, "github_api_url", stand_in.url)
+    monkeypatch.setattr(handler, "github_client_backend", "urllib3")
+    monkeypatch.setattr(handler, "github_client", None)
+    yield stand_in
+    stand_in.close()
+
+
+@pytest.fixture(scope="function")
+def codepipeline_fake(monkeypatch):
+    """CodePipeline fake the handler uses in place of its boto3 client, scriptable like github_stand_in."""
+    import handler
+
+    fake = CodePipelineFake()
+    monkeypatch.setattr(handler, "pipeline_client", fake)
+    yield fake
+
+
 @pytest.fixture(scope="function")
 def codepipeline_client_stub():
     from handler import pipeline_client
@@ -0,0 +1,69 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import run_concurrently
+
+
+def test_results_are_returned_in_item_order():
+    """Test that results keep the order of the items whichever call finishes first"""
+    executor = ThreadPoolExecutor(max_workers=4)
+
+    results = run_concurrently(
+        lambda item: time.sleep(0.05 * (4 - item)) or item * 10,
+        [0, 1, 2, 3],
+        4,
+        executor,
+    )
+
+    assert results == [0, 10, 20, 30]
+
+
+def test_concurrency_limit_is_respected():
+    """Test that no more than concurrency calls are in flight on an executor sized to it"""
+    executor = ThreadPoolExecutor(max_workers=3)
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def operation(item):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+        return item
+
+    results = run_concurrently(operation, list(range(12)), 3, executor)
+
+    assert results == list(range(12))
+    assert peak == 3
+
+
+def test_exceptions_are_returned_in_place():
+    """Test that a failing call is returned as its exception without failing the others"""
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    def operation(item):
+        if item == 1:
+            raise ValueError("bad item")
+        return item
+
+    results = run_concurrently(operation, [0, 1, 2], 2, executor)
+
+    assert results[0] == 0
+    assert isinstance(results[1], ValueError)
+    assert results[2] == 2
+
+
+def test_single_item_runs_inline():
+    """Test that a single item is run on the calling thread without an event loop"""
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    results = run_concurrently(
+        lambda item: threading.current_thread(), ["only"], 4, executor
+    )
+
+    assert results == [threading.current_thread()]
@@ -0,0 +1,180 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+import urllib3
+from exceptions import GitHubApiException
+from exceptions import RateLimitedException
+from github_client import GitHubCommitClient
+from rate_limiter import RateLimiter
+
+
+def github_response(status: int, body: dict, headers: dict | None = None):
+    return urllib3.HTTPResponse(
+        body=json.dumps(body).encode(),
+        status=status,
+        headers=headers or {},
+        preload_content=True,
+    )
+
+
+def test_commit_author_is_read_with_a_single_request():
+    """Test that a commit author costs one GET and the rate limit headers are recorded"""
+    client = GitHubCommitClient("token123", base_url="https://github.example.com/")
+    response = github_response(
+        200,
+        {"commit": {"author": {"email": "someone@example.com"}}},
+        {"X-RateLimit-Remaining": "4321", "X-RateLimit-Limit": "5000"},
+    )
+
+    with patch.object(client._pool, "request", return_value=response) as mock_request:
+        email = client.get_commit_author_email("org/repo", "abc123")
+
+    assert email == "someone@example.com"
+    mock_request.assert_called_once_with(
+        "GET",
+        "https://github.example.com/repos/org/repo/commits/abc123?per_page=1",
+        body=None,
+        headers=None,
+    )
+    assert client.rate_limiting == (4321, 5000)
+
+
+def test_error_status_raises_github_api_exception():
+    """Test that an error status raises GitHubApiException carrying the status and message"""
+    client = GitHubCommitClient("token123")
+    response = github_response(404, {"message": "No commit found for SHA: abc123"})
+
+    with patch.object(client._pool, "request", return_value=response):
+        with pytest.raises(GitHubApiException) as e:
+            client.get_commit_author_email("org/repo", "abc123")
+
+    assert e.value.status == 404
+    assert "No commit found" in str(e.value)
+
+
+def test_transport_error_raises_connection_error():
+    """Test that a failed connection raises ConnectionError so it is retried"""
+    client = GitHubCommitClient("token123")
+
+    with patch.object(
+        client._pool,
+        "request",
+        side_effect=urllib3.exceptions.NewConnectionError(None, "refused"),
+    ):
+        with pytest.raises(ConnectionError):
+            client.get_commit_author_email("org/repo", "abc123")
+
+    assert client.rate_limiting == (-1, -1)
+
+
+def test_graphql_posts_query_and_variables():
+    """Test that GraphQL queries are posted as JSON and the response data is returned"""
+    client = GitHubCommitClient("token123")
+    response = github_response(200, {"data": {"c0": None}})
+
+    with patch.object(client._pool, "request", return_value=response) as mock_request:
+        result = client.graphql("query { c0 }", {"owner": "org"})
+
+    assert result == {"data": {"c0": None}}
+    method, url = mock_request.call_args.args
+    assert (method, url) == ("POST", "https://api.github.com/graphql")
+    assert json.loads(mock_request.call_args.kwargs["body"]) == {
+        "query": "query { c0 }",
+        "variables": {"owner": "org"},
+    }
+    assert (
+        mock_request.call_args.kwargs["headers"]["Authorization"] == "Bearer token123"
+    )
+
+
+def test_get_is_repeated_conditionally_and_304_served_from_the_etag_cache():
+    """Test that a repeated GET sends If-None-Match and a 304 returns the earlier response"""
+    client = GitHubCommitClient("token123")
+    first = github_response(
+        200,
+        {"commit": {"author": {"email": "someone@example.com"}}},
+        {"ETag": '"abc"'},
+    )
+    not_modified = urllib3.HTTPResponse(body=b"", status=304, preload_content=True)
+
+    with patch.object(
+        client._pool, "request", side_effect=[first, not_modified]
+    ) as mock_request:
+        client.get_commit_author_email("org/repo", "abc123")
+        email = client.get_commit_author_email("org/repo", "abc123")
+
+    assert email == "someone@example.com"
+    assert client.not_modified == 1
+    assert mock_request.call_args_list[0].kwargs["headers"] is None
+    assert mock_request.call_args_list[1].kwargs["headers"]["If-None-Match"] == '"abc"'
+
+
+def test_rate_limit_headers_pace_the_rate_limiter():
+    """Test that the core quota GitHub reports is passed on to the rate limiter"""
+    rate_limiter = RateLimiter(reserve=100)
+    client = GitHubCommitClient("token123", rate_limiter=rate_limiter)
+    reset_at = int(time.time()) + 600
+    response = github_response(
+        200,
+        {"commit": {"author": {"email": "someone@example.com"}}},
+        {
+            "X-RateLimit-Remaining": "50",
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Reset": str(reset_at),
+            "X-RateLimit-Resource": "core",
+        },
+    )
+
+    with patch.object(client._pool, "request", return_value=response):
+        client.get_commit_author_email("org/repo", "abc123")
+
+    assert (rate_limiter.remaining, rate_limiter.reset_at) == (50, reset_at)
+    with pytest.raises(RateLimitedException):
+        client.get_commit_author_email("org/repo", "def456")
+
+
+def test_exhausted_rate_limit_raises_rate_limited_exception():
+    """Test that a 403 for an exhausted quota is raised as RateLimitedException"""
+    client = GitHubCommitClient("token123")
+    response = github_response(
+        403,
+        {"message": "API rate limit exceeded"},
+        {"X-RateLimit-Remaining": "0", "X-RateLimit-Limit": "5000"},
+    )
+
+    with patch.object(client._pool, "request", return_value=response):
+        with pytest.raises(RateLimitedException):
+            client.get_commit_author_email("org/repo", "abc123")
+
+
+def test_commit_range_authors_are_read_with_a_single_compare_request():
+    """Test that the authors of a range of commits cost one compare GET"""
+    client = GitHubCommitClient("token123")
+    response = github_response(
+        200,
+        {
+            "total_commits": 2,
+            "commits": [
+                {"sha": "def456", "commit": {"author": {"email": "one@example.com"}}},
+                {"sha": "abc123", "commit": {"author": {"email": "two@example.com"}}},
+            ],
+        },
+    )
+
+    with patch.object(client._pool, "request", return_value=response) as mock_request:
+        commit_authors = client.get_compare_commit_authors(
+            "org/repo", "base000", "abc123"
+        )
+
+    assert commit_authors == [
+        ("def456", "one@example.com"),
+        ("abc123", "two@example.com"),
+    ]
+    mock_request.assert_called_once_with(
+        "GET",
+        "https://api.github.com/repos/org/repo/compare/base000...abc123",
+        body=None,
+        headers=None,
+    )
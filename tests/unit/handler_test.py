@@ -1,9 +1,30 @@
+import io
+import json
+import logging
+import os
+import subprocess  # nosec B404
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from unittest import mock
 from unittest.mock import patch
 
 import pytest
 from botocore.exceptions import ClientError
+from exceptions import BatchEnrichmentException
+from exceptions import RetryBudgetExhaustedException
+from exceptions import GitHubApiException
+from exceptions import RateLimitedException
+from github import BadCredentialsException
 from github import Github
+from github import GithubException
+from github import UnknownObjectException
+from shared_cache import SharedCache
+from tests.stand_ins import CodePipelineFake
+from tests.stand_ins import FaultInjector
+from tests.stand_ins import fixed
 
 
 def test_get_ssm_parameter(ssm):
@@ -30,6 +51,21 @@ def test_get_ssm_parameter_raises_error(ssm):
         assert parameter_result is None
 
 
+def test_get_ssm_parameter_is_cached_across_invocations(ssm):
+    """Test that a warm container serves the parameter from the cache until forced to re-fetch"""
+    # Arrange
+    from handler import get_ssm_parameter
+
+    ssm.put_parameter(Name="foo", Value="bar", Type="SecureString")
+    get_ssm_parameter("foo")
+    ssm.put_parameter(Name="foo", Value="rotated", Type="SecureString", Overwrite=True)
+
+    # Act & Assert
+    assert get_ssm_parameter("foo") == "bar"
+    assert get_ssm_parameter("foo", force_fetch=True) == "rotated"
+    assert get_ssm_parameter("foo") == "rotated"
+
+
 def test_get_pipeline_commit_data_returns_commit_from_source_output(
     codepipeline_client_stub, get_pipeline_execution_success_fixture
 ):
@@ -75,6 +111,7 @@ def test_get_pipeline_commit_data_returns_empty_with_no_source_output(
     assert commit_data == {}
 
 
+@patch("handler.github_client_backend", "pygithub")
 @patch.object(Github, "get_repo")
 def test_get_github_author_returns_valid(
     mock_get_repo, codepipeline_client_stub, get_pipeline_execution_failure_fixture
@@ -110,6 +147,179 @@ def test_get_github_author_returns_not_found(
     assert author_email == "<not found - empty sha>"
 
 
+@patch("handler.github_client_backend", "pygithub")
+@patch.object(Github, "get_repo")
+def test_get_github_author_is_cached_by_repo_and_sha(mock_get_repo):
+    # Arrange
+    from handler import author_cache
+    from handler import get_github_author_email
+
+    mock_get_repo.return_value.get_commit.return_value.commit.author.email = (
+        "mock@example.com"
+    )
+
+    # Act
+    first = get_github_author_email("mock_token", "mock_repo", "mock_sha")
+    second = get_github_author_email("mock_token", "mock_repo", "mock_sha")
+
+    # Assert
+    assert first == second == "mock@example.com"
+    mock_get_repo.assert_called_once_with("mock_repo")
+    assert (author_cache.hits, author_cache.misses) == (1, 1)
+
+
+@patch("handler.github_client_backend", "pygithub")
+@patch.object(Github, "get_repo")
+def test_get_github_author_caches_unknown_commit_briefly(mock_get_repo):
+    # Arrange
+    from handler import author_cache
+    from handler import get_github_author_email
+
+    mock_get_repo.return_value.get_commit.side_effect = UnknownObjectException(
+        404, {"message": "Not Found"}
+    )
+
+    # Act
+    first = get_github_author_email("mock_token", "mock_repo", "unknown_sha")
+    second = get_github_author_email("mock_token", "mock_repo", "unknown_sha")
+
+    # Assert
+    assert first == second == "<not found - unknown commit>"
+    mock_get_repo.assert_called_once_with("mock_repo")
+    assert author_cache.hits == 1
+
+
+def test_get_github_client_is_reused_until_token_changes():
+    # Arrange
+    from handler import get_github_client
+
+    # Act
+    first = get_github_client("token-a")
+    second = get_github_client("token-a")
+    rotated = get_github_client("token-b")
+
+    # Assert
+    assert first is second
+    assert rotated is not first
+    assert get_github_client("token-b") is rotated
+
+
+@patch("handler.get_github_author_email")
+@patch("handler.get_github_client")
+@patch("handler.github_graphql_batch_size", 2)
+def test_get_github_author_emails_batches_graphql_and_falls_back_to_rest(
+    mock_get_github_client, mock_github_author_email
+):
+    # Arrange
+    from handler import get_github_author_emails
+
+    graphql = mock_get_github_client.return_value.graphql
+    graphql.side_effect = [
+        {
+            "data": {
+                "c0": {"object": {"author": {"email": "a@example.com"}}},
+                "c1": {"object": None},
+            }
+        },
+        {"data": {"c0": {"object": {"author": {"email": "c@example.com"}}}}},
+    ]
+    mock_github_author_email.return_value = "<not found - unknown commit>"
+    commits = [("hmrc/a", "sha-a"), ("hmrc/b", "sha-b"), ("hmrc/c", "sha-c")]
+
+    # Act
+    author_emails = get_github_author_emails("mock_token", commits)
+
+    # Assert
+    assert author_emails == {
+        ("hmrc/a", "sha-a"): "a@example.com",
+        ("hmrc/b", "sha-b"): "<not found - unknown commit>",
+        ("hmrc/c", "sha-c"): "c@example.com",
+    }
+    assert graphql.call_count == 2
+    _, first_query_variables = graphql.call_args_list[0].args
+    assert first_query_variables == {
+        "owner0": "hmrc",
+        "name0": "a",
+        "sha0": "sha-a",
+        "owner1": "hmrc",
+        "name1": "b",
+        "sha1": "sha-b",
+    }
+    mock_github_author_email.assert_called_once_with(
+        github_token="mock_token", github_repo="hmrc/b", commit_sha="sha-b"
+    )
+
+
+@patch("handler.get_github_author_email")
+@patch("handler.get_github_client")
+def test_get_github_author_emails_falls_back_to_rest_when_graphql_fails(
+    mock_get_github_client, mock_github_author_email
+):
+    # Arrange
+    from handler import get_github_author_emails
+
+    mock_get_github_client.return_value.graphql.side_effect = GitHubApiException(
+        502, "Bad Gateway"
+    )
+    mock_github_author_email.return_value = "a@example.com"
+
+    # Act
+    author_emails = get_github_author_emails("mock_token", [("hmrc/a", "sha-a")])
+
+    # Assert
+    assert author_emails == {("hmrc/a", "sha-a"): "a@example.com"}
+
+
+@patch("handler.get_github_author_email")
+@patch("handler.get_github_client")
+def test_get_github_author_emails_degrades_when_github_cannot_be_reached(
+    mock_get_github_client, mock_github_author_email
+):
+    """Test that a failed query falls back to REST lookups, which degrade when rate limited"""
+    # Arrange
+    from handler import get_github_author_emails
+
+    mock_get_github_client.return_value.graphql.side_effect = ConnectionError(
+        "connection reset"
+    )
+    mock_github_author_email.side_effect = RateLimitedException("quota exhausted")
+
+    # Act
+    author_emails = get_github_author_emails(
+        "mock_token", [("hmrc/a", "sha-a"), ("hmrc/b", "sha-b")]
+    )
+
+    # Assert
+    assert author_emails == {
+        ("hmrc/a", "sha-a"): "<not found - github rate limited>",
+        ("hmrc/b", "sha-b"): "<not found - github rate limited>",
+    }
+
+
+@patch("retry.time.sleep")
+def test_get_pipeline_commit_data_retries_throttling(
+    mock_sleep, codepipeline_client_stub, get_pipeline_execution_success_fixture
+):
+    # Arrange
+    from handler import get_pipeline_commit_data
+
+    codepipeline_client_stub.add_client_error(
+        "get_pipeline_execution", "ThrottlingException", "Rate exceeded"
+    )
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+
+    # Act
+    commit_data = get_pipeline_commit_data(
+        "telemetry-terraform-pipeline", "0d18ecc5-2611-436b-9d2f-ba7e9bfc721d"
+    )
+
+    # Assert
+    assert commit_data["revisionId"] == "bc051f8d7fbf183dbb840462cb5c17d887964842"
+    mock_sleep.assert_called_once()
+
+
 def test_get_pipeline_execution_handles_incorrect_execution_id(
     codepipeline_client_stub,
 ):
@@ -256,8 +466,10 @@ def test_handler_sqs_golden_path(
     )
 
     # Assert
-    assert response.get("message-header") == "CodePipeline failed: TEL-2490"
-    assert response.get("message-content") == {
+    assert len(response) == 1
+    enriched_event = response[0]
+    assert enriched_event.get("message-header") == "CodePipeline failed: TEL-2490"
+    assert enriched_event.get("message-content") == {
         "mrkdwn_in": ["text"],
         "color": "danger",
         "text": "Build of <https://eu-west-2.console.aws.amazon.com/codesuite/codepipeline/"
@@ -267,27 +479,1400 @@ def test_handler_sqs_golden_path(
     }
 
 
-def test_handler_no_pipeline_execution_source_output(
+@patch("handler.get_github_client")
+def test_handler_sqs_reads_the_shared_cache_for_the_whole_batch(
+    mock_get_github_client,
     ssm,
+    dynamodb,
     codepipeline_client_stub,
-    get_pipeline_execution_failure_fixture,
+    get_pipeline_execution_success_fixture,
+    sqs_message_containing_cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_sqs_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    shared_cache = SharedCache("enrichment-cache", lambda: dynamodb)
+    shared_cache.put(
+        "revisions",
+        ("TEL-2490", "b75f5f61-5186-4e09-9252-33e1b3adcb41"),
+        get_pipeline_execution_success_fixture["pipelineExecution"][
+            "artifactRevisions"
+        ],
+    )
+    shared_cache.put(
+        "author",
+        ("hmrc/telemetry-terraform", "bc051f8d7fbf183dbb840462cb5c17d887964842"),
+        "9415522+duddingl@users.noreply.github.com",
+    )
+
+    # Act
+    with patch("handler.shared_cache", shared_cache):
+        response = enrich_sqs_event(
+            sqs_message_containing_cloudwatch_event_pipeline_failed, context
+        )
+
+    # Assert
+    mock_get_github_client.assert_not_called()
+    assert shared_cache.hits == 2
+    assert "failed after a commit by <@lyndon.dudding>" in response[0].get(
+        "message-content"
+    ).get("text")
+
+
+@patch("handler.get_github_client")
+def test_handler_writes_lookups_back_to_the_shared_cache(
+    mock_get_github_client,
+    ssm,
+    dynamodb,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
     cloudwatch_event_pipeline_failed,
     context,
 ):
     # Arrange
     from handler import enrich_codepipeline_event
 
+    mock_get_github_client.return_value.get_commit_author_email.return_value = (
+        "9415522+duddingl@users.noreply.github.com"
+    )
+    mock_get_github_client.return_value.rate_limiting = (4999, 5000)
     ssm.put_parameter(
         Name="/secrets/github/telemetry_github_token",
         Value="token123",
         Type="SecureString",
     )
     codepipeline_client_stub.add_response(
-        "get_pipeline_execution", get_pipeline_execution_failure_fixture
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+    shared_cache = SharedCache("enrichment-cache", lambda: dynamodb)
+
+    # Act
+    with patch("handler.shared_cache", shared_cache):
+        enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert shared_cache.misses == 1
+    assert shared_cache.get_many(
+        "revisions", [("myPipeline", "01234567-0123-0123-0123-012345678901")]
+    )
+    found = shared_cache.get_many(
+        "author",
+        [("hmrc/telemetry-terraform", "bc051f8d7fbf183dbb840462cb5c17d887964842")],
+    )
+    assert list(found.values()) == ["9415522+duddingl@users.noreply.github.com"]
+
+
+@patch("handler.shared_cache_flush_timeout", 1)
+def test_handler_sqs_waits_for_the_shared_cache_writes_before_returning(
+    ssm,
+    dynamodb,
+    github_stand_in,
+    codepipeline_fake,
+    sqs_message_containing_cloudwatch_event_pipeline_failed,
+    context,
+):
+    """Test that writes still in flight are finished before the container can be frozen"""
+    # Arrange
+    from handler import enrich_sqs_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    put_item = dynamodb.put_item
+
+    def slow_put_item(**kwargs):
+        threading.Event().wait(0.2)
+        return put_item(**kwargs)
+
+    shared_cache = SharedCache(
+        "enrichment-cache",
+        lambda: dynamodb,
+        executor=ThreadPoolExecutor(max_workers=1),
+    )
+
+    # Act
+    with (
+        patch("handler.shared_cache", shared_cache),
+        patch.object(dynamodb, "put_item", side_effect=slow_put_item),
+    ):
+        enrich_sqs_event(
+            sqs_message_containing_cloudwatch_event_pipeline_failed, context
+        )
+    items = dynamodb.scan(TableName="enrichment-cache")["Items"]
+
+    # Assert
+    assert sorted(item["cache_key"]["S"].partition("#")[0] for item in items) == [
+        "author",
+        "revisions",
+    ]
+
+
+@patch("handler.get_github_author_email")
+def test_handler_uses_revision_carried_by_the_event(
+    mock_github_author_email,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    mock_github_author_email.return_value = "9415522+duddingl@users.noreply.github.com"
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    cloudwatch_event_pipeline_failed["detail"]["artifactRevisions"] = (
+        get_pipeline_execution_success_fixture["pipelineExecution"]["artifactRevisions"]
     )
 
     # Act
     response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
 
     # Assert
-    assert response.get("message-header") == "CodePipeline failed: myPipeline"
+    # no get_pipeline_execution response was stubbed, so the API was not called
+    assert "failed after a commit by <@lyndon.dudding>" in response.get(
+        "message-content"
+    ).get("text")
+
+
+@patch("handler.get_github_author_email")
+def test_handler_looks_up_execution_when_event_revision_is_not_usable(
+    mock_github_author_email,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    mock_github_author_email.return_value = "9415522+duddingl@users.noreply.github.com"
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    cloudwatch_event_pipeline_failed["detail"]["artifactRevisions"] = [
+        {"name": "source_output", "revisionId": "", "revisionSummary": "not json"}
+    ]
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+
+    # Act
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert "bc051f8d7fbf183dbb840462cb5c17d887964842" in response.get(
+        "message-content"
+    ).get("text")
+
+
+@pytest.mark.parametrize(
+    "revisions",
+    [
+        None,
+        "source_output",
+        [{"name": "other_output", "revisionId": "abc"}],
+        [
+            {
+                "name": "source_output",
+                "revisionId": "abc",
+                "revisionUrl": "https://codestarurl/redirect?Commit=abc",
+                "revisionSummary": '{"CommitMessage": "message"}',
+            }
+        ],
+        [
+            {
+                "name": "source_output",
+                "revisionId": "abc",
+                "revisionUrl": "https://codestarurl/redirect?FullRepositoryId=hmrc/repo",
+                "revisionSummary": '"message"',
+            }
+        ],
+    ],
+)
+def test_get_event_revisions_rejects_unusable_revisions(revisions):
+    """Test that revisions the enrichment could not use are ignored"""
+    from handler import get_event_revisions
+
+    assert get_event_revisions({"artifactRevisions": revisions}) is None
+
+
+@patch("handler.get_github_author_email")
+def test_handler_caches_execution_lookups(
+    mock_github_author_email,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_failure
+
+    mock_github_author_email.return_value = "9415522+duddingl@users.noreply.github.com"
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+    redelivered_event = json.loads(json.dumps(cloudwatch_event_pipeline_failed))
+
+    # Act
+    enrich_codepipeline_failure(cloudwatch_event_pipeline_failed)
+    response = enrich_codepipeline_failure(redelivered_event)
+
+    # Assert
+    # only one get_pipeline_execution response was stubbed
+    assert "message-content" in response
+
+
+@patch("handler.lookup_commit_author_email")
+def test_handler_enriches_every_github_source_concurrently(
+    mock_lookup_commit_author_email,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    lookup_threads = set()
+
+    def lookup_commit_author_email(github_token, github_repo, commit_sha):
+        lookup_threads.add(threading.current_thread().name)
+        return {
+            "hmrc/telemetry-terraform": "9415522+duddingl@users.noreply.github.com",
+            "hmrc/telemetry-modules": "unknown@example.com",
+        }[github_repo]
+
+    mock_lookup_commit_author_email.side_effect = lookup_commit_author_email
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    execution = get_pipeline_execution_success_fixture["pipelineExecution"]
+    execution["artifactRevisions"] = [
+        {
+            "name": "modules_output",
+            "revisionId": "0123456789abcdef0123456789abcdef01234567",
+            "revisionSummary": '{"ProviderType":"GitHub","CommitMessage":"Bump modules"}',
+            "revisionUrl": "https://codestarurl/redirect?FullRepositoryId=hmrc/telemetry-modules",
+        },
+        {"name": "artifacts_output", "revisionId": "s3-version-id"},
+        *execution["artifactRevisions"],
+    ]
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+
+    # Act
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert mock_lookup_commit_author_email.call_count == 2
+    assert all(name.startswith("lookup") for name in lookup_threads)
+    assert response.get("message-content").get("text") == (
+        "Build of <https://eu-west-2.console.aws.amazon.com/codesuite/codepipeline/pipelines/"
+        "myPipeline/view|myPipeline> failed after commits to 2 sources:\n"
+        "• hmrc/telemetry-terraform: <@lyndon.dudding> - "
+        "<https://github.com/hmrc/telemetry-terraform/commit/bc051f8d7fbf183dbb840462cb5c17d887964842|TEL-3481 "
+        "create pagerduty-config-deployer>\n"
+        "• hmrc/telemetry-modules: <@telemetry-engineers> - "
+        "<https://github.com/hmrc/telemetry-modules/commit/0123456789abcdef0123456789abcdef01234567|Bump modules>"
+    )
+
+
+def test_handler_no_pipeline_execution_source_output(
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_failure_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_failure_fixture
+    )
+
+    # Act
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert response.get("message-header") == "CodePipeline failed: myPipeline"
+
+
+@patch("handler.get_github_author_email")
+def test_handler_sqs_enriches_every_record_and_drops_those_that_cannot_be_enriched(
+    mock_github_author_email,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    sqs_message_containing_cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_sqs_event
+
+    mock_github_author_email.return_value = "9415522+duddingl@users.noreply.github.com"
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    good_record = sqs_message_containing_cloudwatch_event_pipeline_failed[0]
+    second_record = dict(good_record, messageId="second-message-id")
+    bad_record = dict(good_record, messageId="bad-message-id", body='{"detail": {}}')
+    # both good records are for the same execution, so the second is collapsed into the first
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+
+    # Act
+    response = enrich_sqs_event([good_record, bad_record, second_record], context)
+
+    # Assert
+    assert [event.get("message-header") for event in response] == [
+        "CodePipeline failed: TEL-2490"
+    ]
+
+
+@patch(
+    "handler.get_pipeline_revisions",
+    side_effect=RetryBudgetExhaustedException("CodePipeline kept throttling"),
+)
+def test_handler_sqs_fails_the_batch_naming_duplicates_of_a_record_that_failed(
+    mock_get_pipeline_revisions,
+    ssm,
+    sqs_message_containing_cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_sqs_event
+
+    first_record = sqs_message_containing_cloudwatch_event_pipeline_failed[0]
+    duplicate_record = dict(first_record, messageId="duplicate-message-id")
+
+    # Act
+    with pytest.raises(BatchEnrichmentException) as raised:
+        enrich_sqs_event([first_record, duplicate_record], context)
+
+    # Assert
+    assert raised.value.message_ids == [
+        "9d6cd254-4dfa-4646-955f-1a58a10ad819",
+        "duplicate-message-id",
+    ]
+
+
+def test_handler_sqs_passes_on_a_record_that_fails_for_good_without_failing_the_batch(
+    ssm, github_stand_in, codepipeline_fake, cloudwatch_event_pipeline_failed, context
+):
+    """Test that a deleted pipeline does not hold back the alerts of the rest of the batch"""
+    # Arrange
+    from handler import enrich_sqs_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    records = []
+    for pipeline in ["firstPipeline", "deletedPipeline", "secondPipeline"]:
+        event = json.loads(json.dumps(cloudwatch_event_pipeline_failed))
+        event["detail"]["pipeline"] = pipeline
+        records.append({"messageId": pipeline, "body": json.dumps(event)})
+    codepipeline_fake.deleted_pipelines.add("deletedPipeline")
+
+    # Act
+    response = enrich_sqs_event(records, context)
+
+    # Assert
+    assert [event["message-header"] for event in response] == [
+        "CodePipeline failed: firstPipeline",
+        "CodePipeline failed: deletedPipeline",
+        "CodePipeline failed: secondPipeline",
+    ]
+    assert ["message-content" in event for event in response] == [True, False, True]
+
+
+@patch("handler.get_github_client")
+def test_handler_returns_stored_enrichment_for_repeated_delivery(
+    mock_get_github_client,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    mock_get_github_client.return_value.get_commit_author_email.return_value = (
+        "9415522+duddingl@users.noreply.github.com"
+    )
+    mock_get_github_client.return_value.rate_limiting = (4999, 5000)
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+    redelivered_event = json.loads(json.dumps(cloudwatch_event_pipeline_failed))
+
+    # Act
+    first = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+    with patch("handler.get_ssm_parameter") as mock_get_ssm_parameter:
+        second = enrich_codepipeline_event(redelivered_event, context)
+
+    # Assert
+    assert second == first
+    mock_get_ssm_parameter.assert_not_called()
+    mock_get_github_client.return_value.get_commit_author_email.assert_called_once()
+
+
+def test_handler_sqs_redelivered_batch_makes_no_outbound_calls(
+    ssm, github_stand_in, codepipeline_fake, cloudwatch_event_pipeline_failed, context
+):
+    """Test that a fresh instance sharing the idempotency store answers a redelivery from it"""
+    # Arrange
+    import handler
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    records = []
+    for index in range(3):
+        event = json.loads(json.dumps(cloudwatch_event_pipeline_failed))
+        event["detail"]["execution-id"] = f"execution-{index}"
+        records.append({"messageId": f"message-{index}", "body": json.dumps(event)})
+    first = handler.enrich_sqs_event(records, context)
+    # a fresh instance keeps nothing in the container but shares the idempotency table
+    handler.secret_cache.clear()
+    handler.author_cache.clear()
+    handler.execution_cache.clear()
+    handler.github_client = None
+    codepipeline_fake.calls.clear()
+    github_stand_in.requests.clear()
+
+    # Act
+    with patch(
+        "handler.get_ssm_parameter", wraps=handler.get_ssm_parameter
+    ) as mock_get_ssm_parameter:
+        second = handler.enrich_sqs_event(records, context)
+
+    # Assert
+    assert second == first
+    assert codepipeline_fake.calls == []
+    assert github_stand_in.requests == []
+    mock_get_ssm_parameter.assert_not_called()
+
+
+@patch("handler.idempotency_enabled", False)
+@patch("handler.get_github_author_email")
+def test_handler_enriches_repeated_delivery_again_when_idempotency_is_disabled(
+    mock_github_author_email,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    mock_github_author_email.return_value = "9415522+duddingl@users.noreply.github.com"
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+    redelivered_event = json.loads(json.dumps(cloudwatch_event_pipeline_failed))
+
+    # Act
+    enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+    enrich_codepipeline_event(redelivered_event, context)
+
+    # Assert
+    assert mock_github_author_email.call_count == 2
+
+
+def test_handler_sqs_enriches_each_event_of_an_execution_as_itself(
+    ssm,
+    github_stand_in,
+    codepipeline_fake,
+    sqs_message_containing_cloudwatch_event_pipeline_failed,
+    context,
+):
+    """Test that the STARTED, stage and FAILED events of one execution are not collapsed together"""
+    # Arrange
+    from handler import enrich_sqs_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    started_record = sqs_message_containing_cloudwatch_event_pipeline_failed[0]
+    stage_body = json.loads(started_record["body"])
+    stage_body["detail-type"] = "CodePipeline Stage Execution State Change"
+    stage_body["detail"].update(stage="Build", state="FAILED")
+    failed_body = json.loads(started_record["body"])
+    failed_body["detail"]["state"] = "FAILED"
+    records = [
+        started_record,
+        dict(started_record, messageId="stage-message-id", body=json.dumps(stage_body)),
+        dict(
+            started_record, messageId="failed-message-id", body=json.dumps(failed_body)
+        ),
+    ]
+
+    # Act
+    response = enrich_sqs_event(records, context)
+
+    # Assert
+    assert [(event["detail-type"], event["detail"]["state"]) for event in response] == [
+        ("CodePipeline Pipeline Execution State Change", "STARTED"),
+        ("CodePipeline Stage Execution State Change", "FAILED"),
+        ("CodePipeline Pipeline Execution State Change", "FAILED"),
+    ]
+
+
+def test_handler_does_not_return_a_stored_event_of_the_same_execution(
+    ssm, github_stand_in, codepipeline_fake, cloudwatch_event_pipeline_failed, context
+):
+    """Test that the FAILED event of an execution whose STARTED event was stored is enriched"""
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    started_event = json.loads(json.dumps(cloudwatch_event_pipeline_failed))
+    started_event["detail"]["state"] = "STARTED"
+
+    # Act
+    enrich_codepipeline_event(started_event, context)
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert response["detail"]["state"] == "FAILED"
+
+
+@patch("handler.prefetch_commit_authors")
+@patch("handler.enrich_event")
+def test_handler_sqs_enriches_records_concurrently_in_batch_order(
+    mock_enrich_event,
+    mock_prefetch_commit_authors,
+    sqs_message_containing_cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_sqs_event
+
+    def enrich_event(event, context):
+        time.sleep(0.1)
+        return event["detail"]["execution-id"]
+
+    mock_enrich_event.side_effect = enrich_event
+    template = sqs_message_containing_cloudwatch_event_pipeline_failed[0]
+    records = []
+    for index in range(5):
+        body = json.loads(template["body"])
+        body["detail"]["execution-id"] = f"execution-{index}"
+        records.append(
+            dict(template, messageId=f"message-{index}", body=json.dumps(body))
+        )
+
+    # Act
+    start = time.perf_counter()
+    response = enrich_sqs_event(records, context)
+    elapsed = time.perf_counter() - start
+
+    # Assert
+    assert response == [f"execution-{index}" for index in range(5)]
+    assert elapsed < 0.4
+
+
+def test_handler_sqs_drops_undecodable_record(
+    sqs_message_containing_cloudwatch_event_pipeline_failed, context
+):
+    # Arrange
+    from handler import enrich_sqs_event
+
+    bad_record = dict(
+        sqs_message_containing_cloudwatch_event_pipeline_failed[0], body="not json"
+    )
+
+    # Act
+    response = enrich_sqs_event([bad_record], context)
+
+    # Assert
+    assert response == []
+
+
+@patch("handler.get_github_author_email")
+def test_handler_refetches_github_token_after_bad_credentials(
+    mock_github_author_email,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+    from handler import get_ssm_parameter
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="old-token",
+        Type="SecureString",
+    )
+    get_ssm_parameter("/secrets/github/telemetry_github_token")
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="new-token",
+        Type="SecureString",
+        Overwrite=True,
+    )
+    mock_github_author_email.side_effect = [
+        BadCredentialsException(401, {"message": "Bad credentials"}),
+        "9415522+duddingl@users.noreply.github.com",
+    ]
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+
+    # Act
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert mock_github_author_email.call_args.kwargs["github_token"] == "new-token"
+    assert "<@lyndon.dudding>" in response.get("message-content").get("text")
+
+
+@patch("handler.get_github_author_email")
+@patch("handler.concurrent_lookups", True)
+def test_handler_golden_path_with_concurrent_lookups(
+    mock_github_author_email,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    mock_github_author_email.return_value = "9415522+duddingl@users.noreply.github.com"
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+
+    # Act
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert mock_github_author_email.call_args.kwargs["github_token"] == "token123"
+    assert "<@lyndon.dudding>" in response.get("message-content").get("text")
+
+
+@patch("handler.get_ssm_parameter")
+def test_handler_skips_ssm_when_no_pipeline_execution_source_output(
+    mock_get_ssm_parameter,
+    codepipeline_client_stub,
+    get_pipeline_execution_failure_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_failure_fixture
+    )
+
+    # Act
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert response.get("message-content") is None
+    mock_get_ssm_parameter.assert_not_called()
+
+
+@patch("handler.github_client_backend", "pygithub")
+def test_handler_degrades_enrichment_when_github_circuit_breaker_is_open(
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+    from handler import github_circuit_breaker
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+    for _ in range(github_circuit_breaker.failure_threshold):
+        github_circuit_breaker.record_failure()
+
+    # Act
+    with patch.object(Github, "get_repo") as mock_get_repo:
+        response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    mock_get_repo.assert_not_called()
+    assert response.get("message-header") == "CodePipeline failed: myPipeline"
+    assert response.get("message-content").get("text") == (
+        "Build of <https://eu-west-2.console.aws.amazon.com/codesuite/codepipeline/pipelines/"
+        "myPipeline/view|myPipeline> failed after a commit by <@telemetry-engineers> - "
+        "<https://github.com/hmrc/telemetry-terraform/commit/bc051f8d7fbf183dbb840462cb5c17d887964842|TEL-3481 "
+        "create pagerduty-config-deployer>"
+    )
+
+
+def test_handler_degrades_enrichment_when_github_quota_is_low(
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+    from handler import github_rate_limiter
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+    github_rate_limiter.update(github_rate_limiter.reserve - 1, time.time() + 600)
+
+    # Act
+    with patch("urllib3.PoolManager.request") as mock_request:
+        response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    mock_request.assert_not_called()
+    assert "failed after a commit by <@telemetry-engineers>" in response.get(
+        "message-content"
+    ).get("text")
+
+
+@patch("handler.github_client_backend", "pygithub")
+@patch("retry.time.sleep")
+@patch.object(Github, "get_repo")
+def test_handler_degrades_enrichment_when_github_errors(
+    mock_get_repo,
+    mock_sleep,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    cloudwatch_event_pipeline_failed,
+    context,
+):
+    # Arrange
+    from handler import enrich_codepipeline_event
+    from handler import github_circuit_breaker
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+    mock_get_repo.side_effect = GithubException(503, "Service Unavailable")
+
+    # Act
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert "<@telemetry-engineers>" in response.get("message-content").get("text")
+    assert github_circuit_breaker.failures == 1
+
+
+@patch("handler.get_github_author_email")
+def test_handler_emits_stage_latency_metrics(
+    mock_github_author_email,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    sqs_message_containing_cloudwatch_event_pipeline_failed,
+    context,
+    capsys,
+):
+    # Arrange
+    from handler import enrich_sqs_event
+
+    mock_github_author_email.return_value = "9415522+duddingl@users.noreply.github.com"
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+    capsys.readouterr()
+
+    # Act
+    enrich_sqs_event(sqs_message_containing_cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    documents = [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith('{"_aws"')
+    ]
+    assert len(documents) == 1
+    assert documents[0]["EventsPerBatch"] == [1.0]
+    assert documents[0]["DroppedEvents"] == [0.0]
+    assert documents[0]["FailedEvents"] == [0.0]
+    for stage in [
+        "SsmLookupTime",
+        "PipelineExecutionLookupTime",
+        "EventEnrichmentTime",
+        "BatchEnrichmentTime",
+    ]:
+        assert stage in documents[0]
+
+
+@pytest.mark.parametrize("roll, sampled", [(0.05, True), (0.5, False)])
+def test_full_event_is_only_logged_for_sampled_invocations(
+    roll, sampled, cloudwatch_event_invalid_no_detail, context
+):
+    # Arrange
+    from exceptions import EmptyEventDetailException
+    from handler import enrich_codepipeline_event
+    from handler import logger
+
+    log_stream = io.StringIO()
+
+    # Act
+    with (
+        patch.object(logger.registered_handler, "stream", log_stream),
+        patch.object(logger, "initial_log_level", logging.INFO),
+        patch.object(logger, "sampling_rate", 0.1),
+        patch("aws_lambda_powertools.logging.logger.random.random", return_value=roll),
+    ):
+        with pytest.raises(EmptyEventDetailException):
+            enrich_codepipeline_event(cloudwatch_event_invalid_no_detail, context)
+    logger.refresh_sample_rate_calculation()
+
+    # Assert
+    output = log_stream.getvalue()
+    assert ("Event received from CodePipeline" in output) is sampled
+    assert '"lambda_request_id":"abc-123"' in output
+
+
+def test_handler_import_defers_github_boto3_botocore_and_asyncio():
+    """Test that importing the handler, i.e. a cold start, does not import PyGithub, boto3, botocore or asyncio"""
+    # Arrange
+    src_dir = Path(__file__).parents[2] / "src"
+
+    # Act
+    result = subprocess.run(  # nosec B603
+        [sys.executable, "-X", "importtime", "-c", "import handler"],
+        cwd=src_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": str(src_dir)},
+    )
+
+    # Assert
+    imported = {
+        line.split("|")[2].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+    assert "handler" in imported
+    assert "github" not in imported
+    assert "boto3" not in imported
+    assert "asyncio" not in imported
+    # Powertools imports the bare botocore package, under a millisecond, to tag its user agent
+    assert {module for module in imported if module.startswith("botocore")} <= {
+        "botocore"
+    }
+
+
+def test_clients_are_built_on_first_use():
+    """Test that the boto3 clients are still available as module attributes once used"""
+    # Arrange & Act
+    import handler
+
+    # Assert
+    assert handler.aws_client("ssm_client") is handler.ssm_client
+
+
+def test_deadline_client_cuts_the_timeouts_down_to_the_time_left(aws_credentials):
+    """Test that close to the deadline AWS calls go through a client with shorter timeouts"""
+    # Arrange
+    import handler
+
+    # Act
+    with patch.object(handler.retry_budget, "remaining_ms", return_value=None):
+        unbounded = handler.deadline_client("ssm_client")
+    with patch.object(handler.retry_budget, "remaining_ms", return_value=2500):
+        capped = handler.deadline_client("ssm_client")
+        again = handler.deadline_client("ssm_client")
+
+    # Assert
+    assert unbounded is handler.ssm_client
+    assert capped is again
+    assert capped.meta.config.connect_timeout + capped.meta.config.read_timeout == (
+        pytest.approx(2)
+    )
+    assert handler.pipeline_client.meta.service_model.service_name == "codepipeline"
+
+
+@patch("retry.time.sleep")
+def test_get_github_author_retries_through_a_github_5xx_storm(
+    mock_sleep, github_stand_in
+):
+    """Test that a short 5xx storm is retried through against the GitHub stand-in"""
+    # Arrange
+    from handler import get_github_author_email
+
+    github_stand_in.authors[("hmrc/repo", "abc123")] = "someone@example.com"
+    github_stand_in.faults = FaultInjector(script=[503, 502])
+
+    # Act
+    author_email = get_github_author_email("token123", "hmrc/repo", "abc123")
+
+    # Assert
+    assert author_email == "someone@example.com"
+    assert len(github_stand_in.requests) == 3
+    assert mock_sleep.call_count == 2
+
+
+def test_get_github_author_caches_and_reuses_the_stand_in_connection(github_stand_in):
+    """Test that repeated lookups are served from the author cache"""
+    # Arrange
+    from handler import get_github_author_email
+
+    # Act
+    emails = {
+        get_github_author_email("token123", "hmrc/repo", f"sha{index % 3}")
+        for index in range(9)
+    }
+
+    # Assert
+    assert emails == {"sha0@example.com", "sha1@example.com", "sha2@example.com"}
+    assert len(github_stand_in.requests) == 3
+
+
+def test_handler_degrades_once_the_stand_in_quota_runs_low(
+    ssm, github_stand_in, codepipeline_fake, cloudwatch_event_pipeline_failed, context
+):
+    """Test that enrichment stops calling GitHub once the reported quota reaches the reserve"""
+    # Arrange
+    from handler import enrich_codepipeline_event
+    from handler import github_rate_limiter
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    github_stand_in.rate_limit = github_stand_in.remaining = (
+        github_rate_limiter.reserve + 1
+    )
+    events = []
+    for index in range(3):
+        event = json.loads(json.dumps(cloudwatch_event_pipeline_failed))
+        event["detail"]["execution-id"] = f"execution-{index}"
+        events.append(event)
+
+    # Act
+    texts = [
+        enrich_codepipeline_event(event, context)["message-content"]["text"]
+        for event in events
+    ]
+
+    # Assert
+    assert len(github_stand_in.requests) == 1
+    assert all("<@telemetry-engineers>" in text for text in texts)
+    assert github_rate_limiter.quota_low
+
+
+def test_handler_github_request_is_cut_short_at_the_deadline(
+    ssm, github_stand_in, codepipeline_fake, cloudwatch_event_pipeline_failed, context
+):
+    """Test that a slow GitHub request gives up when the invocation runs out of time"""
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    github_stand_in.faults = FaultInjector(latency=fixed(3000))
+    # 800ms left once the retry budget has kept back its reserve
+    context.get_remaining_time_in_millis = lambda: 1800
+
+    # Act
+    start = time.perf_counter()
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+    elapsed = time.perf_counter() - start
+
+    # Assert
+    assert elapsed < 1.5
+    assert "<@telemetry-engineers>" in response["message-content"]["text"]
+
+
+@patch("retry.time.sleep")
+def test_handler_sqs_batch_against_slow_and_throttled_stand_ins(
+    mock_sleep,
+    ssm,
+    github_stand_in,
+    codepipeline_fake,
+    sqs_message_containing_cloudwatch_event_pipeline_failed,
+    context,
+):
+    """Test that a batch is enriched concurrently through latency and throttling"""
+    # Arrange
+    from handler import enrich_sqs_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    github_stand_in.faults = FaultInjector(latency=fixed(50))
+    codepipeline_fake.faults = FaultInjector(latency=fixed(20), script=[400, 400])
+    template = sqs_message_containing_cloudwatch_event_pipeline_failed[0]
+    records = []
+    for index in range(8):
+        body = json.loads(template["body"])
+        body["detail"]["execution-id"] = f"execution-{index}"
+        records.append(
+            dict(template, messageId=f"message-{index}", body=json.dumps(body))
+        )
+
+    # Act
+    start = time.perf_counter()
+    response = enrich_sqs_event(records, context)
+    elapsed = time.perf_counter() - start
+
+    # Assert
+    assert len(response) == 8
+    assert len(codepipeline_fake.calls) == 10
+    # the authors of all 8 commits are resolved by a single GraphQL query
+    assert github_stand_in.requests == [("POST", "/graphql")]
+    # one after another the batch would take at least 8 * (20 + 50) ms
+    assert elapsed < 0.4
+
+
+def test_handler_sqs_batch_is_profiled_when_sampled(
+    ssm,
+    github_stand_in,
+    codepipeline_fake,
+    sqs_message_containing_cloudwatch_event_pipeline_failed,
+    context,
+):
+    """Test that a sampled invocation logs a profile covering the records enriched on the pool"""
+    # Arrange
+    from handler import enrich_sqs_event
+    from handler import profiler
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    github_stand_in.faults = FaultInjector(latency=fixed(30))
+    codepipeline_fake.faults = FaultInjector(latency=fixed(100))
+    template = sqs_message_containing_cloudwatch_event_pipeline_failed[0]
+    records = []
+    for index in range(4):
+        body = json.loads(template["body"])
+        body["detail"]["execution-id"] = f"execution-{index}"
+        records.append(
+            dict(template, messageId=f"message-{index}", body=json.dumps(body))
+        )
+
+    # Act
+    with (
+        patch.object(profiler, "sample_rate", 1),
+        patch.object(profiler, "interval", 0.001),
+        patch.object(profiler, "logger") as mock_logger,
+    ):
+        response = enrich_sqs_event(records, context)
+
+    # Assert
+    assert len(response) == 4
+    summary = mock_logger.info.call_args.kwargs["extra"]["profile"]
+    assert summary["entry_point"] == "enrich_sqs_event"
+    # the executions of the batch are looked up on the record pool before it is enriched
+    assert any(
+        "execution_revisions" in entry["frame"] for entry in summary["top_cumulative"]
+    )
+
+
+@patch("handler.get_github_author_email")
+def test_handler_sqs_drops_unsupported_events(
+    mock_get_github_author_email,
+    ssm,
+    codepipeline_client_stub,
+    get_pipeline_execution_success_fixture,
+    sqs_message_containing_cloudwatch_event_pipeline_failed,
+    context,
+):
+    """Test that a record with no enricher for its event is dropped without failing the batch"""
+    # Arrange
+    from handler import enrich_sqs_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    mock_get_github_author_email.return_value = "someone@example.com"
+    codepipeline_client_stub.add_response(
+        "get_pipeline_execution", get_pipeline_execution_success_fixture
+    )
+    unsupported = {
+        "messageId": "unsupported-message",
+        "body": json.dumps(
+            {"source": "aws.ecs", "detail-type": "ECS Task State Change", "detail": {}}
+        ),
+    }
+
+    # Act
+    response = enrich_sqs_event(
+        [sqs_message_containing_cloudwatch_event_pipeline_failed[0], unsupported],
+        context,
+    )
+
+    # Assert
+    assert len(response) == 1
+
+
+def test_handler_rejects_an_event_without_an_enricher(context):
+    """Test that an event no enricher is registered for raises UnsupportedEventException"""
+    # Arrange
+    from exceptions import UnsupportedEventException
+    from handler import enrich_codepipeline_event
+
+    event = {"source": "aws.ecs", "detail-type": "ECS Task State Change", "detail": {}}
+
+    # Act & Assert
+    with pytest.raises(UnsupportedEventException):
+        enrich_codepipeline_event(event, context)
+
+
+def test_handler_enriches_an_event_without_a_source_as_a_pipeline_event(
+    ssm, github_stand_in, codepipeline_fake, cloudwatch_event_pipeline_failed, context
+):
+    """Test that an input-transformed event that dropped its source is still enriched"""
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    event = {"detail": cloudwatch_event_pipeline_failed["detail"]}
+
+    # Act
+    response = enrich_codepipeline_event(event, context)
+
+    # Assert
+    assert response["message-header"] == "CodePipeline failed: myPipeline"
+
+
+@patch("handler.commit_range_attribution", True)
+def test_handler_attributes_the_failure_to_every_commit_since_the_last_success(
+    ssm, github_stand_in, codepipeline_fake, cloudwatch_event_pipeline_failed, context
+):
+    """Test that every author since the last success is mentioned after one compare request"""
+    # Arrange
+    from handler import author_cache
+    from handler import enrich_codepipeline_event
+    from handler import range_cache
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    pipeline = "myPipeline"
+    execution_id = cloudwatch_event_pipeline_failed["detail"]["execution-id"]
+    head_sha = CodePipelineFake.source_revision(pipeline, execution_id)["revisionId"]
+    last_success = CodePipelineFake.execution_summary(
+        pipeline, "good-execution", "Succeeded"
+    )
+    base_sha = last_success["sourceRevisions"][0]["revisionId"]
+    codepipeline_fake.page_size = 1
+    codepipeline_fake.histories[pipeline] = [
+        CodePipelineFake.execution_summary(pipeline, execution_id, "Failed"),
+        CodePipelineFake.execution_summary(pipeline, "older-execution", "Superseded"),
+        last_success,
+    ]
+    github_stand_in.ranges[("hmrc/myPipeline", base_sha, head_sha)] = [
+        "first",
+        "second",
+        head_sha,
+    ]
+    github_stand_in.authors.update(
+        {
+            ("hmrc/myPipeline", "first"): "9415522+duddingl@users.noreply.github.com",
+            (
+                "hmrc/myPipeline",
+                "second",
+            ): "1253988+nisartahir@users.noreply.github.com",
+            ("hmrc/myPipeline", head_sha): "9415522+duddingl@users.noreply.github.com",
+        }
+    )
+
+    # Act
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+    enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    text = response["message-content"]["text"]
+    assert (
+        f"failed after <https://github.com/hmrc/myPipeline/compare/{base_sha}...{head_sha}"
+        "|3 commits> by <@lyndon.dudding>, <@nisar.tahir> - "
+    ) in text
+    assert github_stand_in.requests[0] == (
+        "GET",
+        f"/repos/hmrc/myPipeline/compare/{base_sha}...{head_sha}",
+    )
+    # three pages for the first event, the repeat is served from the last success and range
+    # caches, and the range is kept apart from the authors
+    assert codepipeline_fake.list_calls == [
+        (pipeline, None),
+        (pipeline, "1"),
+        (pipeline, "2"),
+    ]
+    assert len(github_stand_in.requests) == 1
+    assert range_cache.get(("hmrc/myPipeline", base_sha, head_sha)) is not None
+    assert author_cache.get(("hmrc/myPipeline", f"{base_sha}...{head_sha}")) is None
+
+
+@patch("handler.commit_range_attribution", True)
+def test_handler_ignores_a_success_that_started_after_the_failing_execution(
+    ssm, github_stand_in, codepipeline_fake, cloudwatch_event_pipeline_failed, context
+):
+    """Test that the range starts at the last success before the failure, not the newest one"""
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    pipeline = "myPipeline"
+    execution_id = cloudwatch_event_pipeline_failed["detail"]["execution-id"]
+    head_sha = CodePipelineFake.source_revision(pipeline, execution_id)["revisionId"]
+    earlier_success = CodePipelineFake.execution_summary(
+        pipeline, "earlier-execution", "Succeeded"
+    )
+    base_sha = earlier_success["sourceRevisions"][0]["revisionId"]
+    # a fix pushed after the failure has already gone through
+    codepipeline_fake.histories[pipeline] = [
+        CodePipelineFake.execution_summary(pipeline, "fix-execution", "Succeeded"),
+        CodePipelineFake.execution_summary(pipeline, execution_id, "Failed"),
+        earlier_success,
+    ]
+    github_stand_in.ranges[("hmrc/myPipeline", base_sha, head_sha)] = [
+        "first",
+        head_sha,
+    ]
+
+    # Act
+    enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert github_stand_in.requests[0] == (
+        "GET",
+        f"/repos/hmrc/myPipeline/compare/{base_sha}...{head_sha}",
+    )
+
+
+@patch("handler.commit_range_attribution", True)
+def test_handler_falls_back_to_the_last_commit_when_the_range_cannot_be_compared(
+    ssm, github_stand_in, codepipeline_fake, cloudwatch_event_pipeline_failed, context
+):
+    """Test that a failed compare request still attributes the failure to the commit it ran"""
+    # Arrange
+    from handler import enrich_codepipeline_event
+
+    ssm.put_parameter(
+        Name="/secrets/github/telemetry_github_token",
+        Value="token123",
+        Type="SecureString",
+    )
+    # the base commit no longer exists, e.g. after a force push
+    github_stand_in.faults = FaultInjector(script=[404])
+
+    # Act
+    response = enrich_codepipeline_event(cloudwatch_event_pipeline_failed, context)
+
+    # Assert
+    assert "failed after a commit by <@telemetry-engineers>" in (
+        response["message-content"]["text"]
+    )
+    assert [path.split("/")[4] for _, path in github_stand_in.requests] == [
+        "compare",
+        "commits",
+    ]
@@ -33,6 +33,19 @@ def test_get_slack_handle_for_invalid_user_throws(helper):
     helper.get_slack_handle("i-do-not-exist")
 
 
+def test_get_slack_handle_ignores_email_case(helper):
+    """Test that users are found whatever the case of their email"""
+    assert (
+        helper.get_slack_handle("9415522+DuddingL@users.noreply.github.com")
+        == "lyndon.dudding"
+    )
+
+
+def test_get_slack_handle_defaults_for_unknown_user(helper):
+    """Test that users that are not in the directory get the team handle"""
+    assert helper.get_slack_handle("i-do-not-exist") == "telemetry-engineers"
+
+
 def test_open_sqs_envelope(
     helper, sqs_message_containing_cloudwatch_event_pipeline_failed
 ):
@@ -41,3 +54,15 @@ def test_open_sqs_envelope(
         sqs_message_containing_cloudwatch_event_pipeline_failed
     )
     assert event.get("id") == "4da4f3e3-5b27-557c-b293-a8a8b4a54213"
+
+
+def test_open_sqs_record(
+    helper, sqs_message_containing_cloudwatch_event_pipeline_failed
+):
+    """Test that a single record of an SQS batch can be opened"""
+    record = dict(
+        sqs_message_containing_cloudwatch_event_pipeline_failed[0],
+        body='{"id": "second-event-id"}',
+    )
+
+    assert helper.open_sqs_record(record).get("id") == "second-event-id"
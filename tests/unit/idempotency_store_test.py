@@ -0,0 +1,68 @@
+import time
+
+import pytest
+from aws_lambda_powertools.utilities.idempotency.exceptions import (
+    IdempotencyItemAlreadyExistsError,
+)
+from aws_lambda_powertools.utilities.idempotency.exceptions import (
+    IdempotencyItemNotFoundError,
+)
+from aws_lambda_powertools.utilities.idempotency.persistence.datarecord import (
+    DataRecord,
+)
+from idempotency_store import InMemoryPersistenceLayer
+
+
+def data_record(status: str, expires_in: int, in_progress_expires_in: int = 60):
+    now = time.time()
+    return DataRecord(
+        idempotency_key="enrich#abc",
+        status=status,
+        expiry_timestamp=int(now + expires_in),
+        in_progress_expiry_timestamp=int((now + in_progress_expires_in) * 1000),
+    )
+
+
+def test_records_can_be_read_back_until_deleted():
+    """Test that a stored record is returned until it is deleted"""
+    store = InMemoryPersistenceLayer()
+    record = data_record("COMPLETED", 3600)
+
+    store._put_record(record)
+    found = store._get_record("enrich#abc")
+    store._delete_record(record)
+
+    assert found is record
+    with pytest.raises(IdempotencyItemNotFoundError):
+        store._get_record("enrich#abc")
+
+
+def test_live_record_is_not_replaced():
+    """Test that a second put for a key that is completed or in progress is rejected"""
+    store = InMemoryPersistenceLayer()
+    store._put_record(data_record("INPROGRESS", 3600))
+
+    with pytest.raises(IdempotencyItemAlreadyExistsError) as e:
+        store._put_record(data_record("INPROGRESS", 3600))
+
+    assert e.value.old_data_record.status == "INPROGRESS"
+
+
+def test_expired_record_is_replaced():
+    """Test that a record past its expiry can be written again"""
+    store = InMemoryPersistenceLayer()
+    store._put_record(data_record("COMPLETED", -10))
+
+    store._put_record(data_record("INPROGRESS", 3600))
+
+    assert store._get_record("enrich#abc").status == "INPROGRESS"
+
+
+def test_in_progress_record_of_a_timed_out_invocation_is_replaced():
+    """Test that a record left in progress by an invocation that timed out can be taken over"""
+    store = InMemoryPersistenceLayer()
+    store._put_record(data_record("INPROGRESS", 3600, in_progress_expires_in=-10))
+
+    store._put_record(data_record("INPROGRESS", 3600))
+
+    assert store._get_record("enrich#abc").in_progress_expiry_timestamp > time.time()
@@ -0,0 +1,136 @@
+import json
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import boto3
+from helper import Helper
+from identity_directory import github_user_id
+from identity_directory import IdentityDirectory
+from moto import mock_aws
+
+
+def test_github_user_id_parses_noreply_addresses():
+    """Test that the numeric user ID is only parsed from GitHub noreply addresses"""
+    assert github_user_id("1253988+nisartahir@users.noreply.github.com") == "1253988"
+    assert github_user_id("1253988+NisarTahir@Users.NoReply.GitHub.com") == "1253988"
+    assert github_user_id("nisartahir@users.noreply.github.com") is None
+    assert github_user_id("1253988+nisar@example.com") is None
+
+
+def test_lookup_by_normalised_email_and_github_id():
+    """Test that case-varied emails and renamed noreply logins still find the person"""
+    directory = IdentityDirectory(
+        defaults={
+            "Jane.Doe@Example.com": "jane.doe",
+            "1253988+nisartahir@users.noreply.github.com": "nisar.tahir",
+        }
+    )
+
+    assert directory.get(" jane.doe@example.COM ") == "jane.doe"
+    assert (
+        directory.get("1253988+renamed-login@users.noreply.github.com") == "nisar.tahir"
+    )
+    assert directory.get("someone@example.com") is None
+
+
+def test_directory_is_loaded_from_file_over_defaults(tmp_path):
+    """Test that a local directory file is loaded on top of the defaults"""
+    directory_file = tmp_path / "identities.json"
+    directory_file.write_text(json.dumps({"new.starter@example.com": "new.starter"}))
+    directory = IdentityDirectory(
+        source=str(directory_file), defaults={"old@example.com": "old.timer"}
+    )
+
+    assert directory.get("new.starter@example.com") == "new.starter"
+    assert directory.get("old@example.com") == "old.timer"
+
+
+def test_directory_file_is_loaded_without_boto3(tmp_path):
+    """Test that a local directory file does not need boto3, which only SSM and S3 sources use"""
+    directory_file = tmp_path / "identities.json"
+    directory_file.write_text(json.dumps({"new.starter@example.com": "new.starter"}))
+    directory = IdentityDirectory(source=str(directory_file))
+
+    # a None entry makes import boto3 raise ImportError
+    with patch.dict("sys.modules", {"boto3": None}):
+        assert directory.get("new.starter@example.com") == "new.starter"
+
+
+@patch("identity_directory.time.monotonic")
+def test_directory_is_reloaded_after_ttl(mock_monotonic, tmp_path):
+    """Test that the directory is only read again once the ttl has passed"""
+    mock_monotonic.return_value = 100.0
+    directory_file = tmp_path / "identities.json"
+    directory_file.write_text(json.dumps({"person@example.com": "first.handle"}))
+    directory = IdentityDirectory(source=str(directory_file), ttl=60)
+    assert directory.get("person@example.com") == "first.handle"
+
+    directory_file.write_text(json.dumps({"person@example.com": "second.handle"}))
+    mock_monotonic.return_value = 150.0
+    assert directory.get("person@example.com") == "first.handle"
+
+    mock_monotonic.return_value = 161.0
+    assert directory.get("person@example.com") == "second.handle"
+
+
+def test_failed_load_keeps_defaults(tmp_path):
+    """Test that a missing or broken directory does not stop lookups of the defaults"""
+    directory = IdentityDirectory(
+        source=str(tmp_path / "missing.json"),
+        defaults={"old@example.com": "old.timer"},
+    )
+
+    assert directory.get("old@example.com") == "old.timer"
+
+
+def test_directory_is_loaded_from_s3_and_ssm(aws_credentials):
+    """Test that the directory can be read from an S3 object or an SSM parameter"""
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="eu-west-2")
+        s3.create_bucket(
+            Bucket="identities",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        s3.put_object(
+            Bucket="identities",
+            Key="github-to-slack.json",
+            Body=json.dumps({"s3@example.com": "from.s3"}),
+        )
+        ssm = boto3.client("ssm", region_name="eu-west-2")
+        ssm.put_parameter(
+            Name="/identities/github-to-slack",
+            Value=json.dumps({"ssm@example.com": "from.ssm"}),
+            Type="SecureString",
+        )
+
+        s3_directory = IdentityDirectory(source="s3://identities/github-to-slack.json")
+        ssm_directory = IdentityDirectory(source="ssm:/identities/github-to-slack")
+
+        assert s3_directory.get("s3@example.com") == "from.s3"
+        assert ssm_directory.get("ssm@example.com") == "from.ssm"
+
+
+def test_source_is_read_with_the_client_given():
+    """Test that SSM is read with the client get_client returns, e.g. one with the invocation's timeouts"""
+    ssm_client = Mock()
+    ssm_client.get_parameter.return_value = {
+        "Parameter": {"Value": json.dumps({"ssm@example.com": "from.ssm"})}
+    }
+    get_client = Mock(return_value=ssm_client)
+    directory = IdentityDirectory(
+        source="ssm:/identities/github-to-slack", get_client=get_client
+    )
+
+    assert directory.get("ssm@example.com") == "from.ssm"
+    get_client.assert_called_once_with("ssm")
+    ssm_client.get_parameter.assert_called_once_with(
+        Name="/identities/github-to-slack", WithDecryption=True
+    )
+
+
+def test_missing_email_is_not_in_the_directory():
+    """Test that a commit without an author email gets the default handle, not an error"""
+    helper = Helper(Mock())
+
+    assert IdentityDirectory().get(None) is None
+    assert helper.get_slack_handle(None) == "telemetry-engineers"
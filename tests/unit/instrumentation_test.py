@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from cache import LRUCache
+from instrumentation import log_metrics
+from instrumentation import metrics
+from instrumentation import timed
+from instrumentation import track_cache
+
+
+def emf_documents(output: str) -> list:
+    """Returns the EMF documents written to stdout, skipping log lines"""
+    documents = [
+        json.loads(line) for line in output.splitlines() if line.startswith("{")
+    ]
+    return [document for document in documents if "_aws" in document]
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    metrics.clear_metrics()
+    yield
+    metrics.clear_metrics()
+
+
+def test_nested_entry_points_flush_metrics_once(capsys):
+    """Test that metrics recorded by nested entry points are written in a single EMF document"""
+
+    @log_metrics
+    @timed("InnerTime")
+    def inner():
+        pass
+
+    @log_metrics
+    def outer():
+        inner()
+        inner()
+
+    outer()
+
+    documents = emf_documents(capsys.readouterr().out)
+    assert len(documents) == 1
+    assert len(documents[0]["InnerTime"]) == 2
+
+
+def test_timed_records_even_when_the_block_raises(capsys):
+    """Test that a failing stage still records how long it took"""
+
+    @log_metrics
+    def entry_point():
+        with timed("FailingStageTime"):
+            raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        entry_point()
+
+    documents = emf_documents(capsys.readouterr().out)
+    assert "FailingStageTime" in documents[0]
+
+
+def test_tracked_cache_reports_hit_ratio_since_last_flush(capsys):
+    """Test that the hit ratio only covers lookups made since the previous flush"""
+    cache = LRUCache()
+    cache.set("key", "value")
+    cache.get("key")
+    track_cache("Test", cache)
+
+    @log_metrics
+    def entry_point():
+        cache.get("key")
+        cache.get("key")
+        cache.get("key")
+        cache.get("missing")
+
+    entry_point()
+
+    documents = emf_documents(capsys.readouterr().out)
+    assert documents[0]["TestCacheHitRatio"] == [75.0]
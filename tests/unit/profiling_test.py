@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+from profiling import Profiler
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def busy_loop(seconds: float) -> int:
+    total = 0
+    until = threading.Event()
+    timer = threading.Timer(seconds, until.set)
+    timer.start()
+    while not until.is_set():
+        total += sum(range(100))
+    return total
+
+
+def test_disabled_profiler_calls_the_entry_point_straight_through():
+    """Test that with a sample rate of 0 nothing is profiled or logged"""
+    logger = MagicMock()
+    profiler = Profiler(sample_rate=0, logger=logger)
+
+    @profiler.profile
+    def entry_point(value):
+        return value * 2
+
+    assert entry_point(21) == 42
+    logger.info.assert_not_called()
+
+
+def test_profile_covers_work_on_pool_threads():
+    """Test that the summary names a function that only ran on a thread pool"""
+    logger = MagicMock()
+    profiler = Profiler(sample_rate=1, interval=0.001, paths=(test_dir,), logger=logger)
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    @profiler.profile
+    def entry_point():
+        return list(executor.map(busy_loop, [0.1, 0.1]))
+
+    entry_point()
+
+    (message,) = logger.info.call_args.args
+    summary = logger.info.call_args.kwargs["extra"]["profile"]
+    assert message == "Invocation profile"
+    assert summary["entry_point"] == "entry_point"
+    assert summary["samples"] > 0
+    assert summary["cpu_ms"] > 0
+    assert any("busy_loop" in entry["frame"] for entry in summary["top_self"])
+    assert "peak_kib" in summary["memory"]
+
+
+def test_profile_reports_the_largest_allocations():
+    """Test that tracemalloc attributes the memory retained by the invocation to its line"""
+    logger = MagicMock()
+    profiler = Profiler(sample_rate=1, paths=(test_dir,), logger=logger)
+    retained = []
+
+    @profiler.profile
+    def entry_point():
+        retained.append(bytearray(2 * 1024 * 1024))
+
+    entry_point()
+
+    memory = logger.info.call_args.kwargs["extra"]["profile"]["memory"]
+    assert memory["top"][0]["line"].startswith(
+        os.path.join("unit", "profiling_test.py")
+    )
+    assert memory["top"][0]["size_kib"] >= 2048
+
+
+def test_profile_is_written_to_the_output_dir_even_when_the_entry_point_raises(
+    tmp_path,
+):
+    """Test that a failing invocation is still profiled, to a JSON file when output_dir is set"""
+    logger = MagicMock()
+    profiler = Profiler(
+        sample_rate=1, trace_memory=False, output_dir=str(tmp_path), logger=logger
+    )
+
+    @profiler.profile
+    def entry_point():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        entry_point()
+
+    (profile_file,) = tmp_path.iterdir()
+    summary = json.loads(profile_file.read_text())
+    assert summary["entry_point"] == "entry_point"
+    assert "memory" not in summary
+    logger.info.assert_called_once_with(
+        "Invocation profile written", extra={"path": str(profile_file)}
+    )
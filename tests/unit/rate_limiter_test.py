@@ -0,0 +1,62 @@
+import time
+from unittest.mock import patch
+
+import pytest
+from exceptions import RateLimitedException
+from rate_limiter import RateLimiter
+
+
+def test_burst_is_let_through_then_requests_are_held_back():
+    """Test that up to burst requests go straight through and the next has to wait for a token"""
+    limiter = RateLimiter(rate=1, burst=3, max_wait=0.5)
+
+    for _ in range(3):
+        limiter.acquire()
+
+    with pytest.raises(RateLimitedException):
+        limiter.acquire()
+
+
+@patch("rate_limiter.time.sleep")
+def test_acquire_waits_for_the_next_token(mock_sleep):
+    """Test that a request waits for the next token when it arrives within max_wait"""
+    limiter = RateLimiter(rate=10, burst=1, max_wait=1)
+    limiter.acquire()
+
+    limiter.acquire()
+
+    mock_sleep.assert_called_once()
+    assert 0 < mock_sleep.call_args.args[0] <= 0.1
+
+
+def test_reported_quota_slows_the_refill_rate():
+    """Test that the refill rate is lowered so the quota above the reserve lasts until the reset"""
+    limiter = RateLimiter(rate=10, burst=1, reserve=100, max_wait=1)
+    limiter.update(160, time.time() + 600)
+    limiter.acquire()
+
+    # 60 requests spread over 600 seconds is one every 10 seconds, longer than max_wait
+    with pytest.raises(RateLimitedException):
+        limiter.acquire()
+
+
+def test_low_quota_only_lets_conditional_requests_through():
+    """Test that once the quota is down to the reserve only conditional requests are made"""
+    limiter = RateLimiter(reserve=100)
+
+    limiter.update(100, time.time() + 600)
+
+    assert limiter.quota_low
+    with pytest.raises(RateLimitedException):
+        limiter.acquire()
+    limiter.acquire(conditional=True)
+
+
+def test_low_quota_is_released_at_the_reset():
+    """Test that requests are made again once the quota has reset"""
+    limiter = RateLimiter(reserve=100)
+
+    limiter.update(5, time.time() - 1)
+
+    assert not limiter.quota_low
+    limiter.acquire()
@@ -0,0 +1,109 @@
+import pytest
+from exceptions import UnsupportedEventException
+from registry import EnricherRegistry
+
+
+def test_event_is_dispatched_on_source_and_detail_type():
+    """Test that an event goes to the enricher registered for its source and detail-type"""
+    registry = EnricherRegistry()
+
+    @registry.register("aws.codebuild", "CodeBuild Build State Change")
+    def codebuild_enricher():
+        return lambda event, context: {**event, "enriched-by": "codebuild"}
+
+    @registry.register("aws.ecs", "ECS Deployment State Change")
+    def ecs_enricher():
+        return lambda event, context: {**event, "enriched-by": "ecs"}
+
+    event = {"source": "aws.ecs", "detail-type": "ECS Deployment State Change"}
+
+    assert registry.enrich(event, None)["enriched-by"] == "ecs"
+
+
+def test_source_enricher_takes_events_without_an_enricher_of_their_own():
+    """Test that an enricher registered without a detail-type serves the rest of its source"""
+    registry = EnricherRegistry()
+
+    @registry.register("aws.codepipeline")
+    def pipeline_enricher():
+        return lambda event, context: "any"
+
+    @registry.register("aws.codepipeline", "CodePipeline Stage Execution State Change")
+    def stage_enricher():
+        return lambda event, context: "stage"
+
+    assert (
+        registry.enrich(
+            {
+                "source": "aws.codepipeline",
+                "detail-type": "CodePipeline Stage Execution State Change",
+            },
+            None,
+        )
+        == "stage"
+    )
+    assert (
+        registry.enrich(
+            {
+                "source": "aws.codepipeline",
+                "detail-type": "CodePipeline Action Execution State Change",
+            },
+            None,
+        )
+        == "any"
+    )
+
+
+def test_enricher_is_built_once_by_its_first_event():
+    """Test that an enricher's dependencies are only set up when its first event arrives"""
+    registry = EnricherRegistry()
+    builds = []
+
+    @registry.register("aws.cloudwatch", "CloudWatch Alarm State Change")
+    def alarm_enricher():
+        builds.append("client")
+        return lambda event, context: event
+
+    event = {"source": "aws.cloudwatch", "detail-type": "CloudWatch Alarm State Change"}
+
+    assert builds == []
+    registry.enrich(event, None)
+    registry.enrich(event, None)
+    assert builds == ["client"]
+
+    registry.reset()
+    registry.enrich(event, None)
+    assert builds == ["client", "client"]
+
+
+@pytest.mark.parametrize(
+    "event",
+    [
+        {"source": "aws.ecs", "detail-type": "ECS Task State Change"},
+        {"detail": {}},
+        ["not", "an", "event"],
+    ],
+)
+def test_unknown_event_raises_unsupported_event_exception(event):
+    """Test that events without a registered enricher are rejected"""
+    registry = EnricherRegistry()
+
+    @registry.register("aws.codepipeline")
+    def pipeline_enricher():
+        return lambda event, context: event
+
+    assert not registry.supports(event)
+    with pytest.raises(UnsupportedEventException):
+        registry.enrich(event, None)
+
+
+def test_default_enricher_takes_events_without_a_source():
+    """Test that an event whose source was left out goes to the default enricher"""
+    registry = EnricherRegistry()
+
+    @registry.register("aws.codepipeline", default=True)
+    def pipeline_enricher():
+        return lambda event, context: "pipeline"
+
+    assert registry.enrich({"detail": {"pipeline": "myPipeline"}}, None) == "pipeline"
+    assert not registry.supports({"source": "aws.ecs", "detail": {}})
@@ -0,0 +1,117 @@
+from unittest import mock
+from unittest.mock import patch
+
+import pytest
+from botocore.exceptions import ClientError
+from botocore.exceptions import EndpointConnectionError
+from github import GithubException
+from retry import is_retryable
+from retry import RetryBudget
+
+
+def client_error(code: str, status_code: int = 400) -> ClientError:
+    return ClientError(
+        {
+            "Error": {"Code": code, "Message": code},
+            "ResponseMetadata": {"HTTPStatusCode": status_code},
+        },
+        "GetParameter",
+    )
+
+
+def lambda_context(remaining_ms: int):
+    context = mock.Mock()
+    context.get_remaining_time_in_millis.return_value = remaining_ms
+    return context
+
+
+def test_is_retryable():
+    """Test that throttling, server and connection errors are retried and client errors are not"""
+    assert is_retryable(client_error("ThrottlingException"))
+    assert is_retryable(client_error("InternalServerError", 500))
+    assert is_retryable(EndpointConnectionError(endpoint_url="https://ssm"))
+    assert is_retryable(GithubException(502, "Bad Gateway"))
+    assert is_retryable(GithubException(429, "Too Many Requests"))
+    assert not is_retryable(client_error("ParameterNotFound"))
+    assert not is_retryable(GithubException(404, "Not Found"))
+    assert not is_retryable(ValueError("bad input"))
+
+
+@patch("retry.time.sleep")
+def test_call_retries_until_success(mock_sleep):
+    """Test that retryable errors are retried and counted"""
+    budget = RetryBudget(max_attempts=3)
+    budget.start(lambda_context(60000))
+    operation = mock.Mock(
+        side_effect=[client_error("ThrottlingException"), "value"], __name__="op"
+    )
+
+    assert budget.call(operation, "arg", key="kwarg") == "value"
+    operation.assert_called_with("arg", key="kwarg")
+    assert budget.retries == 1
+    mock_sleep.assert_called_once()
+
+
+@patch("retry.time.sleep")
+def test_call_stops_after_max_attempts(mock_sleep):
+    """Test that the last error is raised once max_attempts is reached"""
+    budget = RetryBudget(max_attempts=2)
+    operation = mock.Mock(side_effect=client_error("ThrottlingException"))
+
+    with pytest.raises(ClientError):
+        budget.call(operation)
+
+    assert operation.call_count == 2
+
+
+def test_call_does_not_retry_client_errors():
+    """Test that non-retryable errors are raised straight away"""
+    budget = RetryBudget()
+    operation = mock.Mock(side_effect=client_error("ParameterNotFound"))
+
+    with pytest.raises(ClientError):
+        budget.call(operation)
+
+    operation.assert_called_once()
+
+
+@patch("retry.time.sleep")
+def test_call_stops_early_when_backoff_would_pass_the_deadline(mock_sleep):
+    """Test that no retry is attempted when its backoff does not fit in the invocation"""
+    from exceptions import RetryBudgetExhaustedException
+
+    budget = RetryBudget(base_delay_ms=1000, max_delay_ms=1000, reserve_ms=1000)
+    budget.start(lambda_context(1500))
+    operation = mock.Mock(
+        side_effect=client_error("ThrottlingException"), __name__="get_parameter"
+    )
+
+    with pytest.raises(RetryBudgetExhaustedException, match="get_parameter"):
+        with patch("retry.random.uniform", return_value=1000):
+            budget.call(operation)
+
+    operation.assert_called_once()
+    mock_sleep.assert_not_called()
+
+
+def test_call_raises_when_no_time_is_left():
+    """Test that calls are not started once the invocation has no time left"""
+    from exceptions import RetryBudgetExhaustedException
+
+    budget = RetryBudget(reserve_ms=1000)
+    budget.start(lambda_context(500))
+    operation = mock.Mock(__name__="get_pipeline_execution")
+
+    with pytest.raises(RetryBudgetExhaustedException):
+        budget.call(operation)
+
+    operation.assert_not_called()
+
+
+def test_context_without_remaining_time_has_no_deadline(context):
+    """Test that local and test contexts, which report no remaining time, are not limited"""
+    budget = RetryBudget()
+
+    budget.start(context)
+
+    assert budget.remaining_ms() is None
@@ -0,0 +1,108 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from shared_cache import SharedCache
+
+
+def test_put_then_get_many_returns_stored_values(dynamodb):
+    """Test that values written to the table are read back in one batch"""
+    cache = SharedCache("enrichment-cache", lambda: dynamodb)
+
+    cache.put("author", ("hmrc/a", "sha-a"), "a@example.com")
+    cache.put("execution", ("pipeline", "exec-1"), {"revisionId": "sha-a"})
+
+    assert cache.get_many(
+        "author", [("hmrc/a", "sha-a"), ("hmrc/b", "sha-b"), ("hmrc/a", "sha-a")]
+    ) == {("hmrc/a", "sha-a"): "a@example.com"}
+    assert cache.get_many("execution", [("pipeline", "exec-1")]) == {
+        ("pipeline", "exec-1"): {"revisionId": "sha-a"}
+    }
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+
+def test_expired_items_are_not_returned(dynamodb):
+    """Test that items past expires_at are misses even before DynamoDB deletes them"""
+    cache = SharedCache("enrichment-cache", lambda: dynamodb)
+
+    cache.put("author", ("hmrc/a", "sha-a"), "a@example.com", ttl=-1)
+
+    assert cache.get_many("author", [("hmrc/a", "sha-a")]) == {}
+
+
+def test_more_keys_than_one_batch_are_read_in_several_requests(dynamodb):
+    """Test that reads are split into BatchGetItem requests of at most 100 keys"""
+    cache = SharedCache("enrichment-cache", mock.Mock(wraps=lambda: dynamodb))
+    keys = [("hmrc/repo", f"sha-{i}") for i in range(150)]
+    for key in keys:
+        cache.put("author", key, f"{key[1]}@example.com")
+
+    with mock.patch.object(
+        dynamodb, "batch_get_item", wraps=dynamodb.batch_get_item
+    ) as batch_get_item:
+        found = cache.get_many("author", keys)
+
+    assert len(found) == 150
+    assert batch_get_item.call_count == 2
+
+
+def test_writes_are_made_on_the_executor(dynamodb):
+    """Test that writes are handed to the executor instead of blocking the caller"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    cache = SharedCache("enrichment-cache", lambda: dynamodb, executor=executor)
+
+    cache.put("author", ("hmrc/a", "sha-a"), "a@example.com").result(timeout=5)
+
+    item = dynamodb.get_item(
+        TableName="enrichment-cache", Key={"cache_key": {"S": "author#hmrc/a#sha-a"}}
+    )["Item"]
+    assert item["cache_value"]["S"] == '"a@example.com"'
+    assert float(item["expires_at"]["N"]) > time.time()
+
+
+def test_flush_waits_for_pending_writes(dynamodb):
+    """Test that flush returns once the writes handed to the executor have been made"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.submit(time.sleep, 0.1)
+    cache = SharedCache("enrichment-cache", lambda: dynamodb, executor=executor)
+
+    cache.put("author", ("hmrc/a", "sha-a"), "a@example.com")
+    cache.flush(timeout=5)
+
+    assert "Item" in dynamodb.get_item(
+        TableName="enrichment-cache", Key={"cache_key": {"S": "author#hmrc/a#sha-a"}}
+    )
+
+
+def test_flush_gives_up_after_the_timeout(dynamodb):
+    """Test that a write that takes too long is left behind with a warning"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.submit(time.sleep, 0.5)
+    logger = mock.Mock()
+    cache = SharedCache(
+        "enrichment-cache", lambda: dynamodb, executor=executor, logger=logger
+    )
+
+    cache.put("author", ("hmrc/a", "sha-a"), "a@example.com")
+    start = time.perf_counter()
+    cache.flush(timeout=0.05)
+
+    assert time.perf_counter() - start < 0.4
+    logger.warning.assert_called_once()
+
+
+def test_table_errors_are_treated_as_misses():
+    """Test that the cache never fails enrichment when the table cannot be reached"""
+    client = mock.Mock()
+    client.batch_get_item.side_effect = ConnectionError("unreachable")
+    client.put_item.side_effect = ConnectionError("unreachable")
+    logger = mock.Mock()
+    cache = SharedCache("enrichment-cache", lambda: client, logger=logger)
+
+    cache.put("author", ("hmrc/a", "sha-a"), "a@example.com")
+    found = cache.get_many("author", [("hmrc/a", "sha-a")])
+
+    assert found == {}
+    assert cache.misses == 1
+    assert logger.warning.call_count == 2